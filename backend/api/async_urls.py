@@ -0,0 +1,20 @@
+from django.urls import include, path
+
+from . import async_views
+
+urlpatterns = [
+    path("tags/", async_views.tag_list, name="tags-list"),
+    path(
+        "ingredients/", async_views.ingredient_list, name="ingredients-list"
+    ),
+    path("recipes/", async_views.recipe_list, name="recipes-list"),
+    path(
+        "recipes/download_shopping_cart/",
+        async_views.download_shopping_cart,
+        name="recipes-download-shopping-cart",
+    ),
+    path(
+        "recipes/<int:pk>/", async_views.recipe_detail, name="recipes-detail"
+    ),
+    path("", include("api.urls")),
+]
@@ -0,0 +1,220 @@
+"""Async versions of the read-only endpoints for the ASGI deployment.
+
+Only GET and HEAD are served here; other methods are passed to the DRF
+views. Blocking work runs through ``run`` on worker threads with their
+own database connections, so independent lookups of a request can be
+awaited together while the event loop keeps serving other clients.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from recipes.models import Recipe
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .conditional import (get_not_modified, get_recipe_state, get_user_state,
+                          make_validators, set_validators)
+from .filters import IngredientFilter, RecipeFilter, get_search
+from .fragments import get_overlay_queryset, recipe_fragments
+from .indexes import ingredient_index
+from .pagination import LimitPagination
+from .shopping_list import RENDERERS, get_shopping_list
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+LIST_ACTIONS = {"get": "list", "post": "create"}
+DETAIL_ACTIONS = {
+    "get": "retrieve",
+    "put": "update",
+    "patch": "partial_update",
+    "delete": "destroy",
+}
+
+
+def run(func, *args, **kwargs):
+    """Await a blocking call made on a worker thread."""
+
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type="application/json",
+        status=status,
+    )
+
+
+def error_response(error):
+    """Render an API exception the way DRF's exception handler does."""
+    data = error.detail
+    if not isinstance(data, (list, dict)):
+        data = {"detail": data}
+    response = json_response(data, status=error.status_code)
+    if isinstance(
+        error, (exceptions.AuthenticationFailed, exceptions.NotAuthenticated)
+    ):
+        response["WWW-Authenticate"] = CachedTokenAuthentication.keyword
+    return response
+
+
+def read_only(sync_view):
+    """Route GET and HEAD to the async view, the rest to ``sync_view``."""
+
+    def decorator(view):
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs
+                )
+            try:
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as error:
+                return error_response(error)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+async def authenticate(request):
+    """Set ``request.user`` from the token, like the DRF views do.
+
+    Returns a DRF request for the helpers that read query params from
+    it.
+    """
+    drf_request = Request(
+        request, authenticators=[CachedTokenAuthentication()]
+    )
+    request.user = await run(getattr, drf_request, "user")
+    return drf_request
+
+
+@read_only(TagViewSet.as_view(LIST_ACTIONS))
+async def tag_list(request):
+    await authenticate(request)
+    return await run(tag_catalogue.response, request)
+
+
+@read_only(IngredientViewSet.as_view(LIST_ACTIONS))
+async def ingredient_list(request):
+    await authenticate(request)
+    name = request.GET.get(IngredientFilter.search_param)
+    if not name:
+        return await run(ingredient_catalogue.response, request)
+    limit = request.GET.get("limit")
+    if limit is not None and not limit.isdigit():
+        return json_response(
+            {"detail": "Limit must be a non-negative integer."}, status=400
+        )
+    return json_response(await run(
+        ingredient_index.search, name, None if limit is None else int(limit)
+    ))
+
+
+def filter_recipes(request, queryset):
+    filterset = RecipeFilter(request.GET, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise exceptions.ValidationError(filterset.errors)
+    return filterset.qs
+
+
+def get_querysets(request):
+    """Filtered recipes for the validators and for the page."""
+    return (
+        filter_recipes(request, Recipe.objects.all()),
+        filter_recipes(request, get_overlay_queryset(request.user)),
+    )
+
+
+def render_page(drf_request, queryset):
+    paginator = LimitPagination()
+    page = paginator.paginate_queryset(queryset, drf_request)
+    data = recipe_fragments.render(page, drf_request, get_search(drf_request))
+    response = paginator.get_paginated_response(data)
+    return json_response(response.data)
+
+
+@read_only(RecipeViewSet.as_view(LIST_ACTIONS))
+async def recipe_list(request):
+    drf_request = await authenticate(request)
+    recipes, overlay = await run(get_querysets, request)
+    recipe_state, user_state = await asyncio.gather(
+        run(get_recipe_state, recipes),
+        run(get_user_state, request.user),
+    )
+    etag, last_modified = make_validators(
+        recipe_state, user_state, request.user
+    )
+    response = get_not_modified(request, etag, last_modified)
+    if response is None:
+        response = await run(render_page, drf_request, overlay)
+    return set_validators(response, etag, last_modified)
+
+
+@read_only(RecipeViewSet.as_view(DETAIL_ACTIONS))
+async def recipe_detail(request, pk):
+    drf_request = await authenticate(request)
+    user_state, recipe = await asyncio.gather(
+        run(get_user_state, request.user),
+        run(get_overlay_queryset(request.user).filter(pk=pk).first),
+    )
+    if recipe is None:
+        raise exceptions.NotFound
+    etag, last_modified = make_validators(
+        {"last_modified": recipe.updated, "count": 1},
+        user_state,
+        request.user,
+        detail=True,
+    )
+    response = get_not_modified(request, etag, last_modified)
+    if response is None:
+        data = await run(recipe_fragments.render, [recipe], drf_request)
+        if not data:
+            raise exceptions.NotFound
+        response = json_response(data[0])
+    return set_validators(response, etag, last_modified)
+
+
+def render_shopping_list(render, user):
+    content = render(get_shopping_list(user))
+    if hasattr(content, "getvalue"):
+        return content.getvalue()
+    return "".join(content)
+
+
+@read_only(RecipeViewSet.as_view({"get": "download_shopping_cart"}))
+async def download_shopping_cart(request):
+    """Build the file on a worker thread and send it in one piece.
+
+    Django 3.2 iterates streaming bodies on the event loop, so the
+    streamed WSGI response would block it while reading the cursor.
+    """
+    await authenticate(request)
+    if request.user.is_anonymous:
+        raise exceptions.NotAuthenticated
+    file_type = request.GET.get("type", "csv")
+    if file_type not in RENDERERS:
+        return json_response(
+            {"detail": "Unsupported file type. "
+                       f"Choose one of: {', '.join(RENDERERS)}."},
+            status=400,
+        )
+    render, content_type, filename = RENDERERS[file_type]
+    response = HttpResponse(
+        await run(render_shopping_list, render, request.user),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,128 @@
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from users.models import User
+
+from .metrics import count_cache
+
+# Loaded from the database on access: the password hash is not copied
+# into the cache, and the counters change under concurrent requests.
+UNCACHED_USER_FIELDS = {"password", *User.counter_fields}
+
+
+class TokenCache:
+    """Bounded LRU of authenticated tokens, optionally backed by a cache.
+
+    Entries live for ``ttl`` seconds. ``invalidate`` drops a token from
+    this process and from the shared cache; other processes may keep
+    their own copy until it expires, so the TTL bounds how long a
+    revoked token can still be accepted by another worker.
+    """
+
+    def __init__(self, size, ttl, alias=None):
+        self.size = size
+        self.ttl = ttl
+        self.alias = alias
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get_shared_key(self, key):
+        return "auth_token:" + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > monotonic():
+                    self.entries.move_to_end(key)
+                    return value
+                del self.entries[key]
+        if self.shared is None:
+            return None
+        value = self.shared.get(self.get_shared_key(key))
+        if value is not None:
+            self.set_local(key, value)
+        return value
+
+    def set_local(self, key, value):
+        with self.lock:
+            self.entries[key] = (monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def set(self, key, value):
+        self.set_local(key, value)
+        if self.shared is not None:
+            self.shared.set(
+                self.get_shared_key(key), value, timeout=self.ttl
+            )
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.get_shared_key(key))
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL,
+    settings.TOKEN_CACHE_ALIAS,
+)
+
+
+def get_values(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.name not in exclude
+    }
+
+
+def from_values(model, values):
+    """New instance of ``model``, deferring fields not in ``values``."""
+    names = [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname in values
+    ]
+    return model.from_db(
+        model.objects.db, names, [values[name] for name in names]
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that reuses recently verified tokens.
+
+    The cache keeps field values only, and every request gets its own
+    user and token instances built from them.
+    """
+
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        count_cache(
+            "auth_token",
+            hits=values is not None,
+            misses=values is None,
+        )
+        if values is None:
+            user, token = super().authenticate_credentials(key)
+            values = {
+                "user": get_values(user, UNCACHED_USER_FIELDS),
+                "token": get_values(token),
+            }
+            token_cache.set(key, values)
+        user = from_values(User, values["user"])
+        token = from_values(self.get_model(), values["token"])
+        token.user = user
+        return user, token
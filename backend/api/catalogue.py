@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from recipes.models import Ingredient, Tag
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import count_cache
+from .serializers import IngredientSerializer, TagSerializer
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an ``Accept-Encoding`` header allows a gzip body.
+
+    An explicit ``gzip`` coding wins over ``*``; either is refused with
+    ``q=0``.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+class Catalogue:
+    """Pre-serialized, pre-compressed list response for static data.
+
+    The JSON body is rendered once, stored in the cache next to its gzip
+    copy and a content hash, and reused until ``invalidate`` is called
+    from the model signals. The entry lives in the default cache, which
+    every process of the server shares, and expires after
+    ``CATALOGUE_CACHE_TTL`` seconds in case a change is made where the
+    signals do not reach.
+    """
+
+    def __init__(self, name, queryset, serializer_class):
+        self.cache_key = f"catalogue_{name}"
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+
+    def build(self):
+        body = JSONRenderer().render(
+            self.serializer_class(self.queryset.all(), many=True).data
+        )
+        digest = hashlib.md5(body).hexdigest()
+        return {
+            "body": body,
+            "gzip": gzip.compress(body),
+            "etag": f'"{digest}"',
+            "gzip_etag": f'"{digest}-gzip"',
+        }
+
+    def get(self):
+        entry = cache.get(self.cache_key)
+        count_cache("catalogue", hits=entry is not None, misses=entry is None)
+        if entry is None:
+            entry = self.build()
+            cache.set(
+                self.cache_key, entry, timeout=settings.CATALOGUE_CACHE_TTL
+            )
+        return entry
+
+    def invalidate(self):
+        cache.delete(self.cache_key)
+
+    def response(self, request):
+        entry = self.get()
+        compressed = accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        # Each encoding is a different representation with its own tag.
+        etag = entry["gzip_etag" if compressed else "etag"]
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                entry["gzip" if compressed else "body"],
+                content_type="application/json",
+            )
+            if compressed:
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+tag_catalogue = Catalogue("tags", Tag.objects.all(), TagSerializer)
+ingredient_catalogue = Catalogue(
+    "ingredients", Ingredient.objects.all(), IngredientSerializer
+)
@@ -0,0 +1,101 @@
+import hashlib
+import time
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from recipes.models import Favorites, ShoppingCart
+from users.models import Follow, User
+
+USER_RELATIONS = (Favorites, ShoppingCart, Follow)
+
+
+def relation_state(model):
+    """Row count and last id of the user's rows in ``model``.
+
+    Ids only grow, so any insert changes the last id and any delete
+    changes the count, even when both happen between two requests.
+    """
+    rows = model.objects.filter(user=OuterRef("pk")).order_by().values("user")
+    return (
+        Subquery(rows.annotate(count=Count("id")).values("count")),
+        Subquery(rows.annotate(last=Max("id")).values("last")),
+    )
+
+
+def get_user_state(user):
+    """Marker of everything the per-user flags of a recipe depend on."""
+    if user.is_anonymous:
+        return ()
+    expressions = {}
+    for model in USER_RELATIONS:
+        count, last = relation_state(model)
+        expressions[f"{model.__name__}_count"] = count
+        expressions[f"{model.__name__}_last"] = last
+    return User.objects.filter(pk=user.pk).annotate(
+        **expressions
+    ).values_list(*expressions).get()
+
+
+def get_recipe_state(queryset):
+    return queryset.order_by().aggregate(
+        last_modified=Max("updated"), count=Count("id")
+    )
+
+
+def make_validators(recipe_state, user_state, user, detail=False):
+    """Weak ETag and Last-Modified from the states of recipes and user.
+
+    Computed from ``Recipe.updated`` and the row count, so no recipe is
+    serialized. Last-Modified is only sent for one recipe to anonymous
+    users: it cannot reflect the per-user flags, nor the recipes deleted
+    from a list. It has a precision of one second, so it is also left
+    out until the second of the last change is over; a second change in
+    the same second would otherwise keep the date.
+    """
+    if not recipe_state["count"]:
+        return None, None
+    marker = repr((
+        recipe_state["last_modified"].isoformat(),
+        recipe_state["count"],
+        user_state,
+    ))
+    etag = "W/" + quote_etag(hashlib.md5(marker.encode()).hexdigest())
+    last_modified = None
+    if detail and user.is_anonymous:
+        seconds = int(recipe_state["last_modified"].timestamp())
+        if seconds + 1 <= time.time():
+            last_modified = seconds
+    return etag, last_modified
+
+
+def get_validators(queryset, user, detail=False):
+    return make_validators(
+        get_recipe_state(queryset), get_user_state(user), user, detail
+    )
+
+
+def get_not_modified(request, etag, last_modified):
+    if etag is None:
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None and response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def conditional_response(request, queryset, respond, detail=False):
+    """Answer with 304 when the client copy is fresh, else ``respond()``."""
+    etag, last_modified = get_validators(queryset, request.user, detail)
+    response = get_not_modified(request, etag, last_modified)
+    if response is None:
+        response = respond()
+    return set_validators(response, etag, last_modified)
@@ -1,7 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
-from recipes.models import Recipe
+from django_filters.fields import MultipleChoiceField
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 from rest_framework.filters import SearchFilter
 
+TAG_IDS_KEY = "tag_ids_by_slug"
+
+
+def get_tag_ids():
+    return cache.get_or_set(
+        TAG_IDS_KEY,
+        lambda: dict(Tag.objects.values_list("slug", "id")),
+        timeout=settings.CATALOGUE_CACHE_TTL,
+    )
+
+
+def resolve_tag_ids(slugs):
+    """Ids of the tags with ``slugs``; unknown slugs are looked up.
+
+    A tag created in another process may be missing from the cached
+    map until it expires, so it is read from the database instead.
+    """
+    tag_ids = get_tag_ids()
+    missing = [slug for slug in slugs if slug not in tag_ids]
+    if missing:
+        found = dict(
+            Tag.objects.filter(slug__in=missing).values_list("slug", "id")
+        )
+        if found:
+            invalidate_tag_ids()
+        tag_ids = {**tag_ids, **found}
+    return [tag_ids[slug] for slug in slugs if slug in tag_ids]
+
+
+def invalidate_tag_ids():
+    cache.delete(TAG_IDS_KEY)
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
+def get_search(request):
+    """The full-text search term of a recipe list request, if any."""
+    return request.query_params.get("search", "").strip()
+
+
+class SlugMultipleChoiceField(MultipleChoiceField):
+    """Accept any slug; the choices only fill the browsable API form."""
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugMultipleChoiceFilter(filters.MultipleChoiceFilter):
+    field_class = SlugMultipleChoiceField
+
 
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(
@@ -10,10 +67,14 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart",
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = SlugMultipleChoiceFilter(
+        choices=get_tag_choices,
+        method="filter_tags",
         label='tags',
     )
+    search = filters.CharFilter(
+        method="filter_search",
+    )
 
     class Meta:
         model = Recipe
@@ -38,6 +99,21 @@ class RecipeFilter(filters.FilterSet):
             )
         return queryset
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef("pk"),
+                tag_id__in=resolve_tag_ids(value),
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef, Prefetch
+from recipes.models import Favorites, IngredientInRecipe, Recipe, ShoppingCart
+from recipes.search import get_snippets
+from users.models import Follow
+
+from .metrics import count_cache
+from .serializers import RecipeSerializer
+
+
+def get_overlay_queryset(user):
+    """Recipes with just the fields needed to lay flags over fragments."""
+    queryset = Recipe.objects.only("id", "author_id", "updated")
+    if user.is_anonymous:
+        return queryset
+    return queryset.annotate(
+        in_favorites=Exists(
+            Favorites.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+        in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+        is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef("author"))
+        ),
+    )
+
+
+class RecipeFragments:
+    """Cache of the part of a recipe representation shared by all users.
+
+    Fragments are keyed by ``Recipe.updated``, which is bumped whenever
+    the recipe, its ingredients, tags or author change, so a stale
+    fragment is never read again and simply expires. The per-user flags
+    are laid over the fragments from annotations on the requested
+    recipes.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_key(self, recipe, base_url):
+        return (
+            f"recipe_fragment:{base_url}:{recipe.pk}:"
+            f"{recipe.updated.timestamp()}"
+        )
+
+    def build(self, ids, request):
+        recipes = Recipe.objects.filter(pk__in=ids).select_related(
+            "author"
+        ).prefetch_related(
+            "tags",
+            Prefetch(
+                "recipe_used",
+                queryset=IngredientInRecipe.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+        for recipe in recipes:
+            recipe.in_favorites = recipe.in_shopping_cart = False
+            recipe.author.is_subscribed = False
+        serializer = RecipeSerializer(
+            recipes, many=True, context={"request": request}
+        )
+        return {item["id"]: item for item in serializer.data}
+
+    def get_many(self, recipes, request):
+        base_url = request.build_absolute_uri("/")
+        keys = {
+            recipe.pk: self.get_key(recipe, base_url) for recipe in recipes
+        }
+        cached = self.cache.get_many(keys.values())
+        fragments = {
+            pk: cached[key] for pk, key in keys.items() if key in cached
+        }
+        missing = keys.keys() - fragments.keys()
+        count_cache(
+            "recipe_fragments", hits=len(fragments), misses=len(missing)
+        )
+        if missing:
+            built = self.build(missing, request)
+            self.cache.set_many(
+                {keys[pk]: fragment for pk, fragment in built.items()},
+                timeout=settings.RECIPE_FRAGMENT_TTL,
+            )
+            fragments.update(built)
+        return fragments
+
+    def render(self, recipes, request, search=None):
+        """Representations of ``recipes`` as ``RecipeSerializer`` gives.
+
+        With a ``search`` term, every recipe also gets a ``search_snippet``
+        of its text with the matches highlighted.
+        """
+        recipes = list(recipes)
+        fragments = self.get_many(recipes, request)
+        snippets = {}
+        if search:
+            snippets = get_snippets([recipe.pk for recipe in recipes], search)
+        data = []
+        for recipe in recipes:
+            fragment = fragments.get(recipe.pk)
+            if fragment is None:
+                # Deleted after the page was read.
+                continue
+            item = dict(fragment)
+            item["is_favorited"] = getattr(recipe, "in_favorites", False)
+            item["is_in_shopping_cart"] = getattr(
+                recipe, "in_shopping_cart", False
+            )
+            item["author"] = dict(
+                fragment["author"],
+                is_subscribed=getattr(recipe, "is_subscribed", False),
+            )
+            if search:
+                item["search_snippet"] = snippets.get(recipe.pk, "")
+            data.append(item)
+        return data
+
+
+recipe_fragments = RecipeFragments(settings.RECIPE_FRAGMENT_CACHE)
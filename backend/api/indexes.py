@@ -0,0 +1,74 @@
+from bisect import bisect_left
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Ingredient
+
+from .metrics import count_cache
+
+INGREDIENT_INDEX_VERSION_KEY = "ingredient_index_version"
+
+
+class IngredientPrefixIndex:
+    """Sorted per-process copy of the ingredient catalogue.
+
+    Prefix lookups are answered with a binary search instead of an
+    ``ILIKE 'x%'`` scan. The index is rebuilt lazily whenever the
+    version key in the cache changes, or after ``INGREDIENT_INDEX_TTL``
+    seconds for deployments whose cache is not shared between workers.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.built_at = None
+        self.index = ([], [])
+
+    def build(self):
+        rows = sorted(
+            (name.casefold(), id, name, measurement_unit)
+            for id, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        )
+        return (
+            [row[0] for row in rows],
+            [
+                {"id": id, "name": name, "measurement_unit": unit}
+                for _, id, name, unit in rows
+            ],
+        )
+
+    def refresh(self):
+        version = cache.get_or_set(
+            INGREDIENT_INDEX_VERSION_KEY, uuid4().hex, timeout=None
+        )
+        expired = (
+            self.built_at is None
+            or monotonic() - self.built_at > settings.INGREDIENT_INDEX_TTL
+        )
+        stale = version != self.version or expired
+        count_cache("ingredient_index", hits=not stale, misses=stale)
+        if stale:
+            self.index = self.build()
+            self.version = version
+            self.built_at = monotonic()
+
+    def search(self, prefix, limit=None):
+        self.refresh()
+        keys, items = self.index
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = start
+        stop = len(keys) if limit is None else min(len(keys), start + limit)
+        while end < stop and keys[end].startswith(prefix):
+            end += 1
+        return items[start:end]
+
+
+def invalidate_ingredient_index():
+    cache.set(INGREDIENT_INDEX_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,168 @@
+"""Prometheus metrics of the API.
+
+Under gunicorn every worker writes its samples to memory-mapped files in
+``PROMETHEUS_MULTIPROC_DIR`` and ``metrics_view`` adds them up, so a
+scrape reports the whole server whichever worker answers it. Without
+the variable the metrics of the single process are reported.
+"""
+import asyncio
+import os
+from time import perf_counter
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+UNMATCHED_ROUTE = "unmatched"
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    # Must exist before the first metric is created.
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+request_duration = Histogram(
+    "foodgram_http_request_duration_seconds",
+    "Time to serve a request, by route and method.",
+    ["route", "method"],
+)
+requests_total = Counter(
+    "foodgram_http_requests",
+    "Requests served, by route, method and status code.",
+    ["route", "method", "status"],
+)
+requests_in_flight = Gauge(
+    "foodgram_http_requests_in_flight",
+    "Requests being served.",
+    multiprocess_mode="livesum",
+)
+db_queries = Histogram(
+    "foodgram_db_queries_per_request",
+    "Database queries made by a request, by route.",
+    ["route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+db_duration = Histogram(
+    "foodgram_db_duration_seconds",
+    "Time a request spent in database queries, by route.",
+    ["route"],
+)
+cache_requests = Counter(
+    "foodgram_cache_requests",
+    "Lookups of the application caches, by cache and result.",
+    ["cache", "result"],
+)
+
+pool_checkouts = Counter(
+    "foodgram_db_pool_checkouts",
+    "Connections taken from the pool, by database and whether they were "
+    "reused or created.",
+    ["database", "result"],
+)
+pool_timeouts = Counter(
+    "foodgram_db_pool_timeouts",
+    "Checkouts that found no free connection in time, by database.",
+    ["database"],
+)
+pool_wait = Histogram(
+    "foodgram_db_pool_checkout_seconds",
+    "Time to take a connection from the pool, by database.",
+    ["database"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+pool_connections = Gauge(
+    "foodgram_db_pool_connections",
+    "Open connections of the pools, by database and state.",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+
+
+def count_cache(cache, hits=0, misses=0):
+    """Count lookups of ``cache``; its hit ratio is computed from these."""
+    if hits:
+        cache_requests.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        cache_requests.labels(cache=cache, result="miss").inc(misses)
+
+
+def observe_pool(pool):
+    stats = pool.get_stats()
+    pool_connections.labels(pool.name, "in_use").set(stats["in_use"])
+    pool_connections.labels(pool.name, "idle").set(stats["idle"])
+
+
+def metrics_view(request):
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
+
+
+class MetricsMiddleware:
+    """Count requests by the name of the URL pattern that served them.
+
+    Streaming responses are timed until the server closes them. The
+    database numbers come from the profile left on the request by
+    ``RequestProfileMiddleware``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        started = perf_counter()
+        requests_in_flight.inc()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            requests_in_flight.dec()
+            raise
+        return self.observe(request, response, started)
+
+    async def __acall__(self, request):
+        started = perf_counter()
+        requests_in_flight.inc()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            requests_in_flight.dec()
+            raise
+        return self.observe(request, response, started)
+
+    def observe(self, request, response, started):
+        match = request.resolver_match
+        route = match.view_name if match else UNMATCHED_ROUTE
+        # Unknown methods would add a label value each.
+        method = request.method if request.method in METHODS else "OTHER"
+
+        def finish():
+            requests_in_flight.dec()
+            request_duration.labels(route, method).observe(
+                perf_counter() - started
+            )
+            requests_total.labels(
+                route, method, response.status_code
+            ).inc()
+            profile = getattr(request, "profile", None)
+            if profile is not None:
+                db_queries.labels(route).observe(profile.queries)
+                db_duration.labels(route).observe(profile.db_time)
+
+        if response.streaming:
+            # Called by the server once the last chunk is sent.
+            response._resource_closers.append(finish)
+        else:
+            finish()
+        return response
@@ -1,5 +1,51 @@
 from rest_framework import pagination
 
 
+def is_ordered_by_id(queryset):
+    """Whether keyset pages on ``-id`` keep the order of ``queryset``."""
+    return list(queryset.query.order_by) in ([], ["-id"])
+
+
+class LimitCursorPagination(pagination.CursorPagination):
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+
 class LimitPagination(pagination.PageNumberPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    Passing the ``cursor`` query param (empty for the first page) switches
+    the request to ``LimitCursorPagination``, which skips the ``COUNT(*)``
+    and seeks on ``id`` instead of using ``OFFSET``. Querysets with an
+    order of their own, such as search results by rank, are paged by
+    number even then, so the order is kept.
+    """
     page_size_query_param = 'limit'
+    cursor_pagination_class = LimitCursorPagination
+    cursor_query_param = LimitCursorPagination.cursor_query_param
+
+    def use_cursor(self, queryset, request):
+        return self.cursor_query_param in request.query_params and (
+            is_ordered_by_id(queryset)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(queryset, request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(LimitPagination):
+    """Keyset pages unless the queryset has its own order."""
+
+    def use_cursor(self, queryset, request):
+        return is_ordered_by_id(queryset)
@@ -0,0 +1,255 @@
+"""Per-request counters of database queries and serialization time.
+
+``RequestProfileMiddleware`` puts a ``RequestProfile`` in a context
+variable for the duration of a request. Every database connection runs
+its queries through ``profile_query``, and the output serializers mix
+in ``ProfiledSerializerMixin``, so both add to the profile of the
+current request, including from the worker threads of the async views.
+Outside of a request they cost one context variable lookup.
+
+The body of a streaming response is produced after the view returns,
+so its iterator is wrapped to run with the profile set, and the log
+line is written when the server closes the response. Headers are sent
+before the body, so ``Server-Timing`` only covers the work done until
+the view returned.
+"""
+import asyncio
+import json
+import logging
+import sys
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar("current_profile", default=None)
+
+ORIGIN_FRAMES = 5
+
+
+def get_origin():
+    """Innermost frames of the project code that led to a query."""
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < ORIGIN_FRAMES:
+        filename = frame.f_code.co_filename
+        if filename.startswith(str(settings.BASE_DIR)) and (
+            filename != __file__
+        ):
+            frames.append(
+                f"{filename[len(str(settings.BASE_DIR)) + 1:]}:"
+                f"{frame.f_lineno} in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return frames
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.db_time = 0
+        self.serialize_time = 0
+        self.serializing = False
+        self.slowest = None
+        self.statements = {}
+        self.lock = Lock()
+
+    def add_query(self, sql, duration):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+            slowest = self.slowest is None or duration > self.slowest[1]
+        if slowest:
+            origin = get_origin()
+            with self.lock:
+                if self.slowest is None or duration > self.slowest[1]:
+                    self.slowest = (sql, duration, origin)
+
+    def add_serialization(self, duration):
+        with self.lock:
+            self.serialize_time += duration
+
+    def finish(self):
+        self.duration = perf_counter() - self.started
+
+    def get_repeated(self):
+        """The statement run most often, a sign of an N+1 pattern."""
+        if not self.statements:
+            return None, 0
+        return max(self.statements.items(), key=lambda item: item[1])
+
+    def get_server_timing(self):
+        return ", ".join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize_time * 1000:.1f}",
+            f"total;dur={self.duration * 1000:.1f}",
+        ))
+
+    def as_dict(self):
+        return {
+            "duration_ms": round(self.duration * 1000, 1),
+            "db_queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 1),
+            "serialize_ms": round(self.serialize_time * 1000, 1),
+            "slowest_query_ms": round(
+                self.slowest[1] * 1000 if self.slowest else 0, 1
+            ),
+            "max_repeated_query": self.get_repeated()[1],
+        }
+
+
+def profile_query(execute, sql, params, many, context):
+    """Execute wrapper that adds the query to the current profile."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, perf_counter() - started)
+
+
+def profile_stream(content, profile):
+    """Iterate ``content`` with ``profile`` as the current profile."""
+    iterator = iter(content)
+    while True:
+        token = current_profile.set(profile)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            current_profile.reset(token)
+        yield chunk
+
+
+class ProfiledSerializerMixin:
+    """Count the time of the outermost ``to_representation`` call.
+
+    The time of the queries made meanwhile is left to the database
+    counters.
+    """
+
+    def to_representation(self, instance):
+        profile = current_profile.get()
+        if profile is None or profile.serializing:
+            return super().to_representation(instance)
+        profile.serializing = True
+        started, db_time = perf_counter(), profile.db_time
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile.serializing = False
+            profile.add_serialization(max(
+                perf_counter() - started - (profile.db_time - db_time), 0
+            ))
+
+
+class RequestProfileMiddleware:
+    """Report the profile of every request.
+
+    The numbers are sent in a ``Server-Timing`` header and in one JSON
+    log line. Requests slower than ``SLOW_REQUEST_THRESHOLD`` seconds are
+    logged as warnings with their slowest and most repeated statements.
+    The log line of a streaming response waits for the body to be sent,
+    but its header only has the numbers known before the body starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        profile = request.profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = request.profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.report(request, response, profile)
+
+    def process_template_response(self, request, response):
+        profile = current_profile.get()
+        if profile is not None:
+            started = perf_counter()
+            response.add_post_render_callback(
+                lambda response: profile.add_serialization(
+                    perf_counter() - started
+                )
+            )
+        return response
+
+    def report(self, request, response, profile):
+        profile.finish()
+        response["Server-Timing"] = profile.get_server_timing()
+        # Files are left alone, the server may send them itself.
+        if response.streaming and (
+            getattr(response, "file_to_stream", None) is None
+        ):
+            response.streaming_content = profile_stream(
+                response.streaming_content, profile
+            )
+
+            def finish():
+                profile.finish()
+                self.log(request, response, profile)
+
+            # Called by the server once the last chunk is sent, before
+            # MetricsMiddleware reads the profile.
+            response._resource_closers.append(finish)
+        else:
+            self.log(request, response, profile)
+        return response
+
+    def log(self, request, response, profile):
+        slow = profile.duration >= settings.SLOW_REQUEST_THRESHOLD
+        if not slow and not logger.isEnabledFor(logging.INFO):
+            return
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "route": match.route if match else None,
+            "status": response.status_code,
+            **profile.as_dict(),
+        }
+        logger.info(json.dumps(record))
+        if slow:
+            sql, duration, origin = profile.slowest or (None, 0, [])
+            repeated, count = profile.get_repeated()
+            logger.warning(
+                "Slow request %s %s took %.1f ms with %d queries.\n"
+                "Slowest query, %.1f ms, from %s:\n%s\n"
+                "Most repeated query, %d times:\n%s",
+                request.method,
+                request.path,
+                profile.duration * 1000,
+                profile.queries,
+                duration * 1000,
+                " <- ".join(origin) or "unknown",
+                sql,
+                count,
+                repeated,
+            )
@@ -1,16 +1,31 @@
 import base64
-
-from django.core.files.base import ContentFile
-from django.db.models import F
+import binascii
+import os
+import tempfile
+import weakref
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile,
+                                            UploadedFile)
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from djoser.serializers import UserCreateSerializer
+from PIL import Image
 from recipes.models import (Favorites, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag)
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from users.models import Follow, User
 
+from .profiling import ProfiledSerializerMixin
+
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -33,6 +48,8 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def get_is_subscribed(self, object):
+        if hasattr(object, "is_subscribed"):
+            return object.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -41,6 +58,14 @@ class UserSerializer(serializers.ModelSerializer):
         ).exists()
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS,
+    )
+
+
 class CustomUserCreateSerializer(UserCreateSerializer):
     class Meta(UserCreateSerializer.Meta):
         fields = (
@@ -64,30 +89,124 @@ class ChangePasswordSerializer(serializers.Serializer):
         return data
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         fields = ("id", "name", "color", "slug")
         model = Tag
 
 
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class Base64TemporaryFile(TemporaryUploadedFile):
+    """Temporary file that storage may move away before it is closed.
+
+    The file is removed when the object is garbage collected unless the
+    storage has already moved it into place.
+    """
+
+    def __init__(self, name, content_type, size):
+        file = tempfile.NamedTemporaryFile(
+            suffix=".upload" + os.path.splitext(name)[1],
+            dir=settings.FILE_UPLOAD_TEMP_DIR,
+            delete=False,
+        )
+        UploadedFile.__init__(self, file, name, content_type, size, None)
+        weakref.finalize(self, remove_file, file.name)
+
+
 class Base64ImageField(serializers.ImageField):
+    """Decodes a base64 data URI into an uploaded file chunk by chunk.
+
+    The size limit is checked from the encoded length before anything is
+    decoded, and the pixel limit from the image header before Pillow
+    reads the image data. Like Django's upload handlers, small images
+    stay in memory and larger ones are spooled to a temporary file.
+    """
+    decode_chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+            data = self.decode(data)
+            self.check_dimensions(data)
 
         return super().to_internal_value(data)
 
+    def decode(self, data):
+        format, _, imgstr = data.partition(";base64,")
+        ext = format.split("/")[-1]
+        size = len(imgstr) * 3 // 4 - imgstr[-2:].count("=")
+        if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                "The image must not exceed "
+                f"{settings.MAX_IMAGE_UPLOAD_SIZE} bytes."
+            )
+
+        content_type = format.partition(":")[2]
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = Base64TemporaryFile("temp." + ext, content_type, size)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, "temp." + ext, content_type, size, None
+            )
+        try:
+            for start in range(0, len(imgstr), self.decode_chunk_size):
+                file.write(base64.b64decode(
+                    imgstr[start:start + self.decode_chunk_size],
+                    validate=True,
+                ))
+        except binascii.Error:
+            file.close()
+            raise serializers.ValidationError("The image is not valid base64.")
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def check_dimensions(self, file):
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = settings.MAX_IMAGE_PIXELS
+        except OSError:
+            # Not an image Pillow recognizes; ImageField reports it.
+            return
+        finally:
+            file.seek(0)
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            file.close()
+            raise serializers.ValidationError(
+                "The image must not exceed "
+                f"{settings.MAX_IMAGE_PIXELS} pixels."
+            )
+
 
-class IngredientSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Maps variant names from ``Recipe.image_variants`` to their URLs."""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for name, path in value.items():
+            if name == "source":
+                continue
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class IngredientSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         fields = ('id', 'name', 'measurement_unit')
         model = Ingredient
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -95,8 +214,9 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     image = Base64ImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField()
     author = UserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -113,19 +233,34 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
+            "favorites_count",
         )
         model = Recipe
 
     def get_ingredients(self, object: Recipe):
+        if "recipe_used" in getattr(object, "_prefetched_objects_cache", {}):
+            return [
+                {
+                    "id": item.ingredient.id,
+                    "name": item.ingredient.name,
+                    "measurement_unit": item.ingredient.measurement_unit,
+                    "amount": item.amount,
+                }
+                for item in object.recipe_used.all()
+            ]
         ingredients = object.ingredients.values(
             'id', 'name', 'measurement_unit',
             amount=F('ingredient_used__amount')
         )
         return ingredients
 
-    def is_object_in_list(self, object, list_model):
+    def is_object_in_list(self, object, list_model, annotation):
+        if hasattr(object, annotation):
+            return getattr(object, annotation)
+
         request = self.context.get('request')
 
         if request is None or request.user.is_anonymous:
@@ -137,10 +272,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_favorited(self, object):
-        return self.is_object_in_list(object, Favorites)
+        return self.is_object_in_list(object, Favorites, "in_favorites")
 
     def get_is_in_shopping_cart(self, object):
-        return self.is_object_in_list(object, ShoppingCart)
+        return self.is_object_in_list(
+            object, ShoppingCart, "in_shopping_cart"
+        )
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -163,42 +300,67 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def ingredients_in_recipe(self, ingredients, recipe):
-        for ingredient in ingredients:
-            ingredient_name = ingredient['id']
-            ingredient_amount = ingredient['amount']
-            ingredients, created = IngredientInRecipe.objects.get_or_create(
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
                 recipe=recipe,
-                ingredient=ingredient_name,
-                amount=ingredient_amount
+                ingredient=ingredient['id'],
+                amount=ingredient['amount'],
             )
+            for ingredient in ingredients
+        )
 
     def to_representation(self, instance):
         serializer = RecipeSerializer(instance)
         return serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        recipe.save()
         self.ingredients_in_recipe(ingredients, recipe)
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        stored = {
+            item.ingredient_id: item for item in recipe.recipe_used.all()
+        }
+        wanted = {
+            ingredient['id'].id: ingredient for ingredient in ingredients
+        }
+        removed = stored.keys() - wanted.keys()
+        if removed:
+            recipe.recipe_used.filter(ingredient_id__in=removed).delete()
+        self.ingredients_in_recipe(
+            [wanted[id] for id in wanted.keys() - stored.keys()], recipe
+        )
+        changed = []
+        for id in stored.keys() & wanted.keys():
+            if stored[id].amount != wanted[id]['amount']:
+                stored[id].amount = wanted[id]['amount']
+                changed.append(stored[id])
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.ingredients.clear()
-        self.ingredients_in_recipe(ingredients, instance)
-        instance.tags.set(tags)
-        instance.save()
+        instance.save(update_fields=[*validated_data, 'updated'])
+        if ingredients is not None:
+            self.update_ingredients(ingredients, instance)
+        if tags is not None:
+            instance.tags.set(tags)
         return instance
 
     def validate(self, data):
-        ingredients = data['ingredients']
-        distinct_ingredients = []
+        ingredients = data.get('ingredients')
+        distinct_ingredients = set()
+
+        if ingredients is None:
+            return data
 
         if len(ingredients) < 1:
             raise serializers.ValidationError(
@@ -206,23 +368,73 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
 
         for ingredient in ingredients:
-            name = ingredient['id']
-            if name in distinct_ingredients:
+            id = ingredient['id']
+            if id in distinct_ingredients:
                 raise serializers.ValidationError(
-                    f'A repeated ingredient has been added to the recipe - {name}'
+                    'A repeated ingredient has been added to the recipe '
+                    f'- {id}'
                 )
-            else:
-                distinct_ingredients.append(name)
+            distinct_ingredients.add(id)
             if int(ingredient['amount']) <= 0:
                 raise serializers.ValidationError(
-                    f'An incorrect quantity of the ingredient is specified - {name}'
+                    'An incorrect quantity of the ingredient is specified '
+                    f'- {id}'
                 )
+
+        found = Ingredient.objects.in_bulk(distinct_ingredients)
+        missing = distinct_ingredients - found.keys()
+        if missing:
+            raise serializers.ValidationError(
+                'Ingredients do not exist - '
+                f'{", ".join(map(str, sorted(missing)))}'
+            )
+        for ingredient in ingredients:
+            ingredient['id'] = found[ingredient['id']]
         return data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """Loads the recipes of every author on the page in one query.
+
+    With ``recipes_limit`` the newest recipes of each author are picked
+    with ``ROW_NUMBER() OVER (PARTITION BY author_id)``, so the page
+    costs the same however many authors it holds.
+    """
+
+    def to_representation(self, data):
+        authors = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        recipes_limit = None
+        if request is not None:
+            recipes_limit = request.query_params.get("recipes_limit")
+        queryset = Recipe.objects.filter(author__in=authors)
+
+        if recipes_limit and recipes_limit.isdigit():
+            ranked = queryset.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=[F("author")],
+                    order_by=F("id").desc(),
+                )
+            ).values("id", "row_number")
+            sql, params = ranked.query.sql_with_params()
+            queryset = Recipe.objects.filter(id__in=RawSQL(
+                f"SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s",
+                (*params, int(recipes_limit)),
+            ))
+
+        recipes = {author.id: [] for author in authors}
+        for recipe in queryset:
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.prefetched_recipes = recipes[author.id]
+        return super().to_representation(authors)
+
+
+class SubscriptionSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     recipes = SerializerMethodField(read_only=True)
-    recipes_count = SerializerMethodField(read_only=True)
     is_subscribed = SerializerMethodField(read_only=True)
 
     class Meta:
@@ -235,12 +447,19 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             "is_subscribed",
             "recipes",
             "recipes_count",
+            "followers_count",
         )
         model = User
+        list_serializer_class = SubscriptionListSerializer
 
     def get_recipes(self, object):
         request = self.context.get("request")
         context = {"request": request}
+        if hasattr(object, "prefetched_recipes"):
+            return RecipeForSubscriptionSerializer(
+                object.prefetched_recipes, many=True, context=context
+            ).data
+
         recipe_limit = request.query_params.get("recipes_limit")
         queryset = Recipe.objects.filter(author=object)
 
@@ -250,10 +469,9 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             queryset, many=True, context=context
         ).data
 
-    def get_recipes_count(self, object):
-        return Recipe.objects.filter(author=object).count()
-
     def get_is_subscribed(self, object):
+        if hasattr(object, "is_subscribed"):
+            return object.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -262,9 +480,12 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         ).exists()
 
 
-class RecipeForSubscriptionSerializer(serializers.ModelSerializer):
+class RecipeForSubscriptionSerializer(
+    ProfiledSerializerMixin, serializers.ModelSerializer
+):
     image = Base64ImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
         model = Recipe
@@ -0,0 +1,100 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import Sum
+from recipes.models import IngredientInRecipe
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+HEADER = ("Ingredient Name", "Quantity", "Measurement Units")
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class Echo:
+    """File-like object that hands written lines back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    """Sum ingredient amounts over the user's shopping cart in one query.
+
+    Rows are read through ``iterator()``, which uses a server-side cursor
+    on PostgreSQL, so the list is never materialized in memory.
+    """
+    return IngredientInRecipe.objects.filter(
+        recipe__is_in_shopping_cart__user=user
+    ).values_list(
+        "ingredient__name", "ingredient__measurement_unit"
+    ).annotate(
+        total=Sum("amount")
+    ).order_by(
+        "ingredient__name", "ingredient__measurement_unit"
+    ).iterator(chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for name, measurement_unit, total in rows:
+        yield writer.writerow([name, total, measurement_unit])
+
+
+def render_text(rows):
+    yield "Shopping list\n\n"
+    for name, measurement_unit, total in rows:
+        yield f"- {name} ({measurement_unit}) - {total}\n"
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        return "Helvetica"
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+    )
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    """Draw the list page by page and return the finished document.
+
+    A PDF ends with a cross-reference table of byte offsets, so unlike
+    the text formats it can only be sent once it is complete.
+    """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = get_pdf_font()
+    width, height = A4
+    y = height - PDF_MARGIN
+    pdf.setFont(font, PDF_FONT_SIZE)
+    pdf.drawString(PDF_MARGIN, y, "Shopping list")
+    y -= PDF_LINE_HEIGHT * 2
+    for name, measurement_unit, total in rows:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(
+            PDF_MARGIN, y, f"- {name} ({measurement_unit}) - {total}"
+        )
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+RENDERERS = {
+    "csv": (render_csv, "text/csv", "shopping_cart.csv"),
+    "txt": (render_text, "text/plain; charset=utf-8", "shopping_cart.txt"),
+    "pdf": (render_pdf, "application/pdf", "shopping_cart.pdf"),
+}
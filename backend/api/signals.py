@@ -0,0 +1,69 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from foodgram.db.signals import (checkout_timed_out, connection_checked_out,
+                                 connection_released)
+from recipes.models import Ingredient, Tag
+from recipes.signals import ingredients_loaded
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from .authentication import token_cache
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .filters import invalidate_tag_ids
+from .indexes import invalidate_ingredient_index
+from .metrics import observe_pool, pool_checkouts, pool_timeouts, pool_wait
+from .profiling import profile_query
+
+
+@receiver((post_save, post_delete, ingredients_loaded), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_index()
+    ingredient_catalogue.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    tag_catalogue.invalidate()
+    invalidate_tag_ids()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def credentials_changed(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or {"password", "is_active"} & update_fields:
+        for key in Token.objects.filter(user=instance).values_list(
+            "key", flat=True
+        ):
+            token_cache.invalidate(key)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_query)
+
+
+@receiver(connection_checked_out)
+def pool_connection_checked_out(sender, reused, wait_time, **kwargs):
+    pool_checkouts.labels(
+        sender.name, "reused" if reused else "created"
+    ).inc()
+    pool_wait.labels(sender.name).observe(wait_time)
+    observe_pool(sender)
+
+
+@receiver(connection_released)
+def pool_connection_released(sender, **kwargs):
+    observe_pool(sender)
+
+
+@receiver(checkout_timed_out)
+def pool_checkout_timed_out(sender, **kwargs):
+    pool_timeouts.labels(sender.name).inc()
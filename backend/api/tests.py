@@ -0,0 +1,244 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from .authentication import CachedTokenAuthentication, token_cache
+
+PAGE_SIZES = (1, 6, 20)
+
+
+class RecipeQueryCountTest(TestCase):
+    """Recipe list and detail cost the same queries at every page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            User.objects.create_user(
+                username=f"author{i}",
+                email=f"author{i}@example.com",
+                password="password",
+                first_name="Author",
+                last_name=str(i),
+            )
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="password",
+            first_name="Reader",
+            last_name="Reader",
+        )
+        Follow.objects.create(user=cls.user, author=authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [
+            Tag.objects.create(name=f"Tag {i}", slug=f"tag{i}", color="#FFF")
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ingredient {i}", measurement_unit="g"
+            )
+            for i in range(5)
+        ]
+        for i in range(25):
+            recipe = Recipe.objects.create(
+                author=authors[i % 3],
+                name=f"Recipe {i}",
+                text="Text",
+                cooking_time=10,
+            )
+            recipe.tags.set(tags[:1 + i % 3])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1
+                )
+                for ingredient in ingredients[:2 + i % 3]
+            )
+        cls.recipe = recipe
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        token_cache.entries.clear()
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def assert_flat(self, client, url, warm_queries, cold_queries):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                for cache in caches.all():
+                    cache.clear()
+                token_cache.entries.clear()
+                with self.assertNumQueries(cold_queries):
+                    response = client.get(url, {"limit": limit})
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(warm_queries):
+                    response = client.get(url, {"limit": limit})
+                self.assertEqual(response.status_code, 200)
+
+    def test_list_anonymous(self):
+        self.assert_flat(self.anonymous, "/api/recipes/", 3, 6)
+
+    def test_list_authenticated(self):
+        self.assert_flat(self.authenticated, "/api/recipes/", 4, 8)
+
+    def test_detail_anonymous(self):
+        self.assert_flat(
+            self.anonymous, f"/api/recipes/{self.recipe.pk}/", 2, 5
+        )
+
+    def test_detail_authenticated(self):
+        self.assert_flat(
+            self.authenticated, f"/api/recipes/{self.recipe.pk}/", 3, 7
+        )
+
+    def test_list_returns_page(self):
+        response = self.authenticated.get("/api/recipes/", {"limit": 20})
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(response.data["count"], 25)
+
+
+class RecipeListValidatorTest(TestCase):
+    """A list changed within the same second is not reported unchanged."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="password",
+            first_name="Author",
+            last_name="Author",
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f"Recipe {i}", text="Text", cooking_time=5
+            )
+            for i in range(2)
+        ]
+
+    def test_list_has_no_last_modified(self):
+        response = self.client.get("/api/recipes/")
+        self.assertIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_deleted_recipe_changes_list(self):
+        self.recipes[0].delete()
+        response = self.client.get(
+            "/api/recipes/",
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+
+class TokenCacheTest(TestCase):
+    """Cached tokens never share a user instance between requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.follower = (
+            User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="password",
+                first_name=name,
+                last_name=name,
+            )
+            for name in ("author", "follower")
+        )
+        cls.token = Token.objects.create(user=cls.author)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        token_cache.entries.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_each_request_gets_own_user(self):
+        authentication = CachedTokenAuthentication()
+        first, _ = authentication.authenticate_credentials(self.token.key)
+        second, token = authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertIsNot(first, second)
+        self.assertIs(token.user, second)
+        self.assertEqual(second.pk, self.author.pk)
+        self.assertIn("password", second.get_deferred_fields())
+
+    def test_set_password_keeps_counters(self):
+        self.client.get("/api/users/me/")
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": "password", "new_password": "n3w-Pass!"},
+        )
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertTrue(self.author.check_password("n3w-Pass!"))
+
+
+class RecipeSearchTest(TestCase):
+    """Snippets are made for the recipes of the page only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="password",
+            first_name="Author",
+            last_name="Author",
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=5
+            )
+            for name, text in (
+                ("Soup", "<i>Hot</i> soup"),
+                ("Salad", "No match"),
+                ("Stew", "Thick as a soup"),
+            )
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_page_is_ranked_with_snippets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/recipes/", {"search": "soup", "limit": 1}
+            )
+        self.assertEqual(response.data["count"], 2)
+        (recipe,) = response.data["results"]
+        self.assertEqual(recipe["id"], self.recipes[0].pk)
+        self.assertEqual(
+            recipe["search_snippet"], "&lt;i&gt;Hot&lt;/i&gt; <b>soup</b>"
+        )
+        highlighting = [
+            query for query in queries.captured_queries
+            if "snippet(" in query["sql"] or "ts_headline" in query["sql"]
+        ]
+        self.assertEqual(len(highlighting), 1)
+
+    def test_cursor_keeps_rank_order(self):
+        response = self.client.get(
+            "/api/recipes/", {"search": "soup", "cursor": "", "limit": 2}
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.recipes[0].pk, self.recipes[2].pk],
+        )
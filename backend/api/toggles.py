@@ -0,0 +1,113 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from recipes.signals import relations_added, relations_removed
+
+
+def get_columns(model, values):
+    instance = model(**values)
+    fields = [model._meta.get_field(name) for name in values]
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    params = [getattr(instance, field.attname) for field in fields]
+    return instance, columns, params
+
+
+def add_relation(model, **values):
+    """Insert a row unless it exists, in one ``INSERT ... ON CONFLICT``.
+
+    Returns whether the row was inserted. ``post_save`` is sent for a
+    new row, so the counters kept by the signal handlers stay correct.
+    """
+    instance, columns, params = get_columns(model, values)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} "
+            f"({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(params))}) "
+            "ON CONFLICT DO NOTHING RETURNING id",
+            params,
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        instance.pk = row[0]
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=True,
+            update_fields=None,
+            raw=False,
+            using=connection.alias,
+        )
+    return True
+
+
+def remove_relation(model, **values):
+    """Delete a row in one ``DELETE ... RETURNING``.
+
+    Returns whether a row was deleted and sends ``post_delete`` for it.
+    """
+    instance, columns, params = get_columns(model, values)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+            f"WHERE {' AND '.join(f'{column} = %s' for column in columns)} "
+            "RETURNING id",
+            params,
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        instance.pk = row[0]
+        post_delete.send(
+            sender=model, instance=instance, using=connection.alias
+        )
+    return True
+
+
+def add_relations(model, field, targets, **values):
+    """Insert a row for every target in one ``INSERT ... ON CONFLICT``.
+
+    Returns the set of targets that were inserted and sends
+    ``relations_added`` for them, so counters are updated once per batch.
+    """
+    if not targets:
+        return set()
+    _, columns, params = get_columns(model, values)
+    target = connection.ops.quote_name(model._meta.get_field(field).column)
+    placeholders = f"({', '.join(['%s'] * (len(params) + 1))})"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} "
+            f"({', '.join(columns)}, {target}) "
+            f"VALUES {', '.join([placeholders] * len(targets))} "
+            f"ON CONFLICT DO NOTHING RETURNING {target}",
+            [value for id in targets for value in (*params, id)],
+        )
+        added = {row[0] for row in cursor.fetchall()}
+        if added:
+            relations_added.send(sender=model, target_ids=added, **values)
+    return added
+
+
+def remove_relations(model, field, targets, **values):
+    """Delete the rows of every target in one ``DELETE ... RETURNING``.
+
+    Returns the set of targets whose rows were deleted and sends
+    ``relations_removed`` for them.
+    """
+    if not targets:
+        return set()
+    _, columns, params = get_columns(model, values)
+    target = connection.ops.quote_name(model._meta.get_field(field).column)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+            f"WHERE {' AND '.join(f'{column} = %s' for column in columns)} "
+            f"AND {target} IN ({', '.join(['%s'] * len(targets))}) "
+            f"RETURNING {target}",
+            [*params, *targets],
+        )
+        removed = {row[0] for row in cursor.fetchall()}
+        if removed:
+            relations_removed.send(sender=model, target_ids=removed, **values)
+    return removed
@@ -1,22 +1,58 @@
-import csv
-from io import StringIO
-
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import BooleanField, Value
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorites, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.feed import get_feed
+from recipes.models import Favorites, Ingredient, Recipe, ShoppingCart, Tag
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from users.models import Follow, User
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPagination
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .conditional import conditional_response
+from .filters import IngredientFilter, RecipeFilter, get_search
+from .fragments import get_overlay_queryset, recipe_fragments
+from .indexes import ingredient_index
+from .pagination import FeedPagination, LimitPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (ChangePasswordSerializer, CustomUserCreateSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
-                          RecipeSerializer, SubscriptionSerializer,
-                          TagSerializer, UserSerializer)
+from .serializers import (BulkIdsSerializer, ChangePasswordSerializer,
+                          CustomUserCreateSerializer, IngredientSerializer,
+                          RecipeCreateSerializer, RecipeSerializer,
+                          SubscriptionSerializer, TagSerializer,
+                          UserSerializer)
+from .shopping_list import RENDERERS, get_shopping_list
+from .toggles import (add_relation, add_relations, remove_relation,
+                      remove_relations)
+
+
+def bulk_toggle(request, model, field, targets):
+    """Add or remove the user's relations to a list of ids at once.
+
+    Every id gets a status: ``added``, ``exists`` or ``not_found`` for
+    POST, ``removed`` or ``missing`` for DELETE.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+    user = request.user
+
+    if request.method == "POST":
+        found = set(targets.filter(pk__in=ids).values_list("pk", flat=True))
+        added = add_relations(model, field, found, user=user)
+        statuses = {
+            id: "added" if id in added else "exists" for id in found
+        }
+    else:
+        removed = remove_relations(model, field, ids, user=user)
+        statuses = {id: "removed" for id in removed}
+
+    default = "not_found" if request.method == "POST" else "missing"
+    return Response({
+        "results": [
+            {"id": id, "status": statuses.get(id, default)} for id in ids
+        ]
+    })
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -48,42 +84,41 @@ class UserViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            if Follow.objects.filter(user=user, author=target_user).exists():
+            if not add_relation(Follow, user=user, author=target_user):
                 return Response(
                     {"detail": "You are already subscribed to this user."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            Follow.objects.create(user=user, author=target_user)
-
-            target_user.is_subscribed = True
-            target_user.save()
-
             return Response(
                 {"detail": "You have subscribed to the user."},
                 status=status.HTTP_201_CREATED,
             )
 
-        if request.method == "DELETE":
-            if not Follow.objects.filter(
-                user=user, author=target_user
-            ).exists():
-                return Response(
-                    {"detail": "You are not subscribed to this user."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            Follow.objects.filter(user=user, author=target_user).delete()
-
-            if not Follow.objects.filter(user=user).exists():
-                target_user.is_subscribed = False
-                target_user.save()
-
+        if not remove_relation(Follow, user=user, author=target_user):
             return Response(
-                {"detail": "You have unsubscribed from the user."},
-                status=status.HTTP_204_NO_CONTENT,
+                {"detail": "You are not subscribed to this user."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        return {}
+
+        return Response(
+            {"detail": "You have unsubscribed from the user."},
+            status=status.HTTP_204_NO_CONTENT,
+        )
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="subscribe",
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def bulk_subscribe(self, request):
+        return bulk_toggle(
+            request,
+            Follow,
+            "author",
+            User.objects.exclude(pk=request.user.pk),
+        )
 
     @action(
         detail=False,
@@ -93,7 +128,9 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        follows = User.objects.filter(following__user=user)
+        follows = User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
         paginator = LimitPagination()
         result_page = paginator.paginate_queryset(follows, request)
         serializer = SubscriptionSerializer(
@@ -124,7 +161,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=["password"])
         return Response(
             {"message": "Password successfully changed."},
             status=status.HTTP_204_NO_CONTENT
@@ -160,9 +197,7 @@ class TagViewSet(viewsets.ModelViewSet):
     ]
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return tag_catalogue.response(request)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -181,6 +216,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return [IsAuthorOrReadOnly()]
         return [permissions.IsAuthenticated()]
 
+    def get_queryset(self):
+        if self.action not in ["list", "retrieve", "feed"]:
+            return Recipe.objects.all()
+
+        return get_overlay_queryset(self.request.user)
+
+    def render(self, recipes, search=None):
+        return recipe_fragments.render(recipes, self.request, search)
+
+    def list(self, request, *args, **kwargs):
+        def respond():
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            search = get_search(request)
+            if page is None:
+                return Response(self.render(queryset, search))
+            return self.get_paginated_response(self.render(page, search))
+
+        return conditional_response(
+            request, self.filter_queryset(Recipe.objects.all()), respond
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        def respond():
+            data = self.render([self.get_object()])
+            if not data:
+                raise Http404
+            return Response(data[0])
+
+        try:
+            recipes = Recipe.objects.filter(pk=kwargs["pk"])
+        except ValueError:
+            raise Http404
+        return conditional_response(request, recipes, respond, detail=True)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -189,6 +260,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def feed(self, request):
+        queryset = get_feed(
+            self.filter_queryset(self.get_queryset()), request.user
+        )
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            self.render(page, get_search(request))
+        )
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -200,37 +286,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
 
         if request.method == "POST":
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
+            if not add_relation(ShoppingCart, user=user, recipe=recipe):
                 return Response(
                     {"detail": "Recipe is already added to the shopping list."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-
             return Response(
                 {"detail": "Recipe added to the shopping list."},
                 status=status.HTTP_201_CREATED,
             )
 
-        if request.method == "DELETE":
-            try:
-                shopping_cart_item = ShoppingCart.objects.get(
-                    user=user, recipe=recipe
-                )
-            except ShoppingCart.DoesNotExist:
-                return Response(
-                    {"detail": "Recipe not found in the shopping list."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            shopping_cart_item.delete()
-
+        if not remove_relation(ShoppingCart, user=user, recipe=recipe):
             return Response(
-                {"detail": "Recipe removed from the shopping list."},
-                status=status.HTTP_204_NO_CONTENT,
+                {"detail": "Recipe not found in the shopping list."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        return {}
+
+        return Response(
+            {"detail": "Recipe removed from the shopping list."},
+            status=status.HTTP_204_NO_CONTENT,
+        )
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def bulk_shopping_cart(self, request):
+        return bulk_toggle(
+            request, ShoppingCart, "recipe", Recipe.objects.all()
+        )
 
     @action(
         detail=False,
@@ -239,39 +326,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated],
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart_items = ShoppingCart.objects.filter(user=user)
-        ingredient_counts = {}
-
-        for item in shopping_cart_items:
-            recipe = item.recipe
-            ingredients_in_recipe = IngredientInRecipe.objects.filter(
-                recipe=recipe
+        file_type = request.query_params.get("type", "csv")
+        if file_type not in RENDERERS:
+            return Response(
+                {"detail": "Unsupported file type. "
+                           f"Choose one of: {', '.join(RENDERERS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        render, content_type, filename = RENDERERS[file_type]
+        content = render(get_shopping_list(request.user))
 
-            for ingredient_in_recipe in ingredients_in_recipe:
-                ingredient = ingredient_in_recipe.ingredient
-                amount = ingredient_in_recipe.amount
-
-                if ingredient in ingredient_counts:
-                    ingredient_counts[ingredient] += amount
-                else:
-                    ingredient_counts[ingredient] = amount
-
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(
-            ["Ingredient Name", "Quantity", "Measurement Units"]
-        )
-
-        for ingredient, amount in ingredient_counts.items():
-            writer.writerow(
-                [ingredient.name, amount, ingredient.measurement_unit]
+        if file_type == "pdf":
+            return FileResponse(
+                content, as_attachment=True, filename=filename
             )
 
-        response = HttpResponse(output.getvalue(), content_type="text/csv")
+        response = StreamingHttpResponse(content, content_type=content_type)
         response["Content-Disposition"] = (
-            'attachment; filename="shopping_cart.csv"'
+            f'attachment; filename="{filename}"'
         )
 
         return response
@@ -285,38 +357,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def favorite(self, request, pk=None):
         recipe = self.get_object()
         user = request.user
-        favorite, created = Favorites.objects.get_or_create(
-            user=user, recipe=recipe
-        )
 
         if request.method == "POST":
-            if created:
-                return Response(
-                    {"detail": "Recipe added to favorites."},
-                    status=status.HTTP_201_CREATED,
-                )
-            else:
+            if not add_relation(Favorites, user=user, recipe=recipe):
                 return Response(
                     {"detail": "Recipe is already added to favorites."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        if request.method == "DELETE":
-            if not created:
-                favorite.delete()
-                return Response(
-                    {"detail": "Recipe removed from favorites."},
-                    status=status.HTTP_204_NO_CONTENT,
-                )
-            else:
-                return Response(
-                    {"detail": "Recipe not found in favorites."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+            return Response(
+                {"detail": "Recipe added to favorites."},
+                status=status.HTTP_201_CREATED,
+            )
 
-        if request.method == "GET":
-            is_favorited = not created
-            return Response({"is_favorited": is_favorited})
+        if not remove_relation(Favorites, user=user, recipe=recipe):
+            return Response(
+                {"detail": "Recipe not found in favorites."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"detail": "Recipe removed from favorites."},
+            status=status.HTTP_204_NO_CONTENT,
+        )
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def bulk_favorite(self, request):
+        return bulk_toggle(request, Favorites, "recipe", Recipe.objects.all())
 
 
 class IngredientViewSet(viewsets.ModelViewSet):
@@ -328,3 +400,19 @@ class IngredientViewSet(viewsets.ModelViewSet):
     ]
     filter_backends = [IngredientFilter, ]
     search_fields = ['^name', ]
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientFilter.search_param)
+        if not name:
+            return ingredient_catalogue.response(request)
+        limit = request.query_params.get("limit")
+        if limit is not None and not limit.isdigit():
+            return Response(
+                {"detail": "Limit must be a non-negative integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            ingredient_index.search(
+                name, None if limit is None else int(limit)
+            )
+        )
@@ -0,0 +1,44 @@
+"""Work done once before the workers fork, instead of on first requests.
+
+With ``preload_app`` gunicorn imports the application in the master
+process and forks the workers from it, so the imported modules, the
+in-memory ingredient index and the local-memory caches are shared with
+the workers copy-on-write.
+"""
+import logging
+from time import perf_counter
+
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .filters import get_tag_ids
+from .indexes import ingredient_index
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Load what the first requests would otherwise load lazily."""
+    started = perf_counter()
+    # Importing the URLconf imports every view and serializer module.
+    get_resolver().url_patterns
+    try:
+        tag_catalogue.get()
+        ingredient_catalogue.get()
+        get_tag_ids()
+        ingredient_index.refresh()
+    except DatabaseError:
+        # A database that is not up yet must not keep the server down;
+        # the caches are then filled by the first requests as usual.
+        logger.exception("Could not warm up the caches.")
+    logger.info("Warmed up in %.3f s.", perf_counter() - started)
+
+
+def connect_databases():
+    """Open the connections of a worker before its first request."""
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.exception("Could not connect to %s.", connection.alias)
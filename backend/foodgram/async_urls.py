@@ -0,0 +1,9 @@
+from api.metrics import metrics_view
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
+    path("api/", include("api.async_urls")),
+]
@@ -0,0 +1,31 @@
+class CounterFieldsMixin:
+    """Leave denormalized counters out of saves of the whole row.
+
+    The counters are changed with ``F()`` updates from the signals, so a
+    full save of an instance read before such an update would write the
+    old count back. Saves of existing rows without ``update_fields``
+    update every other loaded field instead.
+    """
+
+    counter_fields = ()
+
+    def save(
+        self, force_insert=False, force_update=False, using=None,
+        update_fields=None,
+    ):
+        if update_fields is None and not (
+            force_insert or self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
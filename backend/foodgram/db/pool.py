@@ -0,0 +1,319 @@
+"""Bounded per-process pool of database connections.
+
+Django opens a connection for every thread and, with ``CONN_MAX_AGE``
+of 0, closes it at the end of every request. The database backends in
+this package take the connections from a ``ConnectionPool`` instead and
+give them back when Django closes them, so a request pays for a
+connection handshake only when the pool has none to reuse.
+
+The pool is configured with a ``POOL`` dictionary in the database
+settings:
+
+- ``SIZE``: connections the process may keep open at the same time;
+- ``TIMEOUT``: seconds to wait for a free connection before failing;
+- ``IDLE_TIMEOUT``: seconds after which an unused connection is closed;
+- ``HEALTH_CHECK_AFTER``: seconds of idleness after which a connection
+  is checked with a query before it is reused; 0 checks every time;
+- ``STATS_INTERVAL``: seconds between the log lines with pool usage.
+
+Checkouts, timeouts and returned connections are also sent as the
+signals of ``foodgram.db.signals`` with the pool as the sender, so the
+counters can be exported as metrics.
+"""
+import logging
+import os
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from .signals import (checkout_timed_out, connection_checked_out,
+                      connection_released)
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "SIZE": 10,
+    "TIMEOUT": 10,
+    "IDLE_TIMEOUT": 300,
+    "HEALTH_CHECK_AFTER": 0,
+    "STATS_INTERVAL": 60,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Connections of one database shared by the threads of a process.
+
+    ``checkout`` returns an idle connection, opens a new one while there
+    are fewer than ``size``, or waits for one to be given back with
+    ``checkin``. Counters of checkouts, waits and connections opened and
+    discarded are returned by ``get_stats`` to size the pool.
+    """
+
+    def __init__(
+        self, name, size, timeout, idle_timeout, health_check_after,
+        stats_interval,
+    ):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.stats_interval = stats_interval
+        self.condition = Condition()
+        self.reset()
+
+    def reset(self):
+        # Connections inherited from the parent process are forgotten,
+        # not closed, as they belong to the parent.
+        self.pid = os.getpid()
+        self.idle = deque()
+        self.opened = 0
+        self.stats = dict.fromkeys(
+            (
+                "checkouts", "reused", "created", "discarded", "waits",
+                "timeouts", "wait_time", "max_wait_time",
+            ),
+            0,
+        )
+        self.logged_at = monotonic()
+
+    def checkout(self, connect, ping, close):
+        """Return a live connection, opening it with ``connect``."""
+        started = monotonic()
+        waited = timed_out = False
+        with self.condition:
+            if self.pid != os.getpid():
+                self.reset()
+            while True:
+                self.close_expired(close)
+                if self.idle:
+                    connection, returned_at = self.idle.pop()
+                    break
+                if self.opened < self.size:
+                    self.opened += 1
+                    connection = None
+                    break
+                remaining = started + self.timeout - monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    timed_out = True
+                    break
+                waited = True
+                self.condition.wait(remaining)
+        if timed_out:
+            checkout_timed_out.send(sender=self)
+            raise PoolTimeout(
+                f"No connection to {self.name} was freed in "
+                f"{self.timeout} s; all {self.size} are in use."
+            )
+        if connection is not None and (
+            monotonic() - returned_at < self.health_check_after
+            or ping(connection)
+        ):
+            self.count_checkout(started, waited, reused=True)
+            return connection
+        if connection is not None:
+            # The new connection takes the slot of the dead one.
+            self.close_quietly(connection, close)
+        try:
+            connection = connect()
+        except BaseException:
+            self.release_slot()
+            raise
+        self.count_checkout(started, waited, reused=False)
+        return connection
+
+    def checkin(self, connection, reset, close):
+        """Take back a connection; ``reset`` tells whether it is reusable."""
+        if self.pid != os.getpid() or not reset(connection):
+            self.discard(connection, close)
+            return
+        with self.condition:
+            self.idle.append((connection, monotonic()))
+            self.condition.notify()
+        connection_released.send(sender=self)
+        self.log_stats()
+
+    def discard(self, connection, close):
+        self.close_quietly(connection, close)
+        self.release_slot()
+        connection_released.send(sender=self)
+
+    def close_quietly(self, connection, close):
+        try:
+            close(connection)
+        except Exception:
+            pass
+        with self.condition:
+            self.stats["discarded"] += 1
+
+    def release_slot(self):
+        with self.condition:
+            self.opened -= 1
+            self.condition.notify()
+
+    def close_expired(self, close):
+        """Close the connections left unused for ``idle_timeout``.
+
+        Must be called with ``condition`` held; the oldest connections
+        are at the left of ``idle``.
+        """
+        expire_before = monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][1] < expire_before:
+            connection, _ = self.idle.popleft()
+            self.close_quietly(connection, close)
+            self.opened -= 1
+
+    def close_idle(self, close):
+        with self.condition:
+            while self.idle:
+                connection, _ = self.idle.pop()
+                try:
+                    close(connection)
+                except Exception:
+                    pass
+                self.opened -= 1
+            self.condition.notify_all()
+        connection_released.send(sender=self)
+
+    def count_checkout(self, started, waited, reused):
+        wait_time = monotonic() - started
+        with self.condition:
+            self.stats["checkouts"] += 1
+            self.stats["reused" if reused else "created"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_time"] += wait_time
+                self.stats["max_wait_time"] = max(
+                    self.stats["max_wait_time"], wait_time
+                )
+        connection_checked_out.send(
+            sender=self, reused=reused, wait_time=wait_time
+        )
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                **self.stats,
+                "size": self.size,
+                "open": self.opened,
+                "idle": len(self.idle),
+                "in_use": self.opened - len(self.idle),
+            }
+
+    def log_stats(self):
+        now = monotonic()
+        with self.condition:
+            if now - self.logged_at < self.stats_interval:
+                return
+            self.logged_at = now
+        logger.info(
+            "Connection pool %s: %s",
+            self.name,
+            " ".join(
+                f"{key}={value:.3f}" if isinstance(value, float)
+                else f"{key}={value}"
+                for key, value in self.get_stats().items()
+            ),
+        )
+
+
+pools = {}
+
+
+def get_pool(alias, settings_dict):
+    """The pool of a database, or ``None`` when it is not pooled.
+
+    Pools are keyed by the connection parameters too, so the test
+    database or a changed ``NAME`` never gets a connection to another
+    database.
+    """
+    options = settings_dict.get("POOL")
+    if not options or alias == NO_DB_ALIAS:
+        return None
+    key = (
+        alias,
+        settings_dict["NAME"],
+        settings_dict["HOST"],
+        settings_dict["PORT"],
+        settings_dict["USER"],
+    )
+    if key not in pools:
+        options = {**DEFAULTS, **options}
+        pools.setdefault(key, ConnectionPool(
+            alias,
+            options["SIZE"],
+            options["TIMEOUT"],
+            options["IDLE_TIMEOUT"],
+            options["HEALTH_CHECK_AFTER"],
+            options["STATS_INTERVAL"],
+        ))
+    return pools[key]
+
+
+def close_pools():
+    """Close every idle connection, e.g. before the process forks."""
+    for pool in list(pools.values()):
+        pool.close_idle(lambda connection: connection.close())
+
+
+class PooledDatabaseWrapperMixin:
+    """Take connections from the pool and give them back on close."""
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.checkout(
+                lambda: super(
+                    PooledDatabaseWrapperMixin, self
+                ).get_new_connection(conn_params),
+                self.ping,
+                self.close_connection,
+            )
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        if self.in_atomic_block:
+            # Django keeps using the connection until the block exits.
+            with self.wrap_database_errors:
+                pool.discard(self.connection, self.close_connection)
+            return
+        pool.checkin(
+            self.connection, self.reset_connection, self.close_connection
+        )
+
+    def ping(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except self.Database.Error:
+            return False
+        return True
+
+    def reset_connection(self, connection):
+        """Roll back what is left of a transaction before the reuse."""
+        try:
+            connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def close_connection(self, connection):
+        connection.close()
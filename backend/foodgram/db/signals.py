@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+connection_checked_out = Signal()
+connection_released = Signal()
+checkout_timed_out = Signal()
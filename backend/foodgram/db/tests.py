@@ -0,0 +1,175 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.db import OperationalError, transaction
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+from prometheus_client import REGISTRY
+from recipes.models import Favorites, Recipe
+from users.models import Follow, User
+
+from .pool import get_pool, pools
+
+ALIAS = "default"
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """The pool of the ``foodgram.db.sqlite3`` backend."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.connections = ConnectionHandler({ALIAS: {
+            "ENGINE": "foodgram.db.sqlite3",
+            "NAME": os.path.join(directory.name, "db.sqlite3"),
+            "POOL": {
+                "SIZE": 2,
+                "TIMEOUT": 0.1,
+                "IDLE_TIMEOUT": 60,
+                "HEALTH_CHECK_AFTER": 0,
+            },
+        }})
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        pool = self.get_pool()
+        pool.close_idle(lambda connection: connection.close())
+        for key in [key for key, value in pools.items() if value is pool]:
+            del pools[key]
+
+    def get_pool(self):
+        return get_pool(ALIAS, self.connections[ALIAS].settings_dict)
+
+    def connect(self):
+        wrapper = self.connections.create_connection(ALIAS)
+        self.wrappers.append(wrapper)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def test_closed_connection_is_reused(self):
+        wrapper = self.connect()
+        connection = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, connection)
+        stats = self.get_pool().get_stats()
+        self.assertEqual((stats["created"], stats["reused"]), (1, 1))
+        self.assertEqual((stats["open"], stats["in_use"]), (1, 1))
+
+    def test_checkout_times_out_when_all_are_in_use(self):
+        self.connect()
+        self.connect()
+        with self.assertRaises(OperationalError):
+            self.connect()
+        stats = self.get_pool().get_stats()
+        self.assertEqual((stats["timeouts"], stats["open"]), (1, 2))
+
+    def test_idle_connection_expires(self):
+        pool = self.get_pool()
+        pool.idle_timeout = 0.01
+        wrapper = self.connect()
+        connection = wrapper.connection
+        wrapper.close()
+        time.sleep(0.02)
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, connection)
+        stats = pool.get_stats()
+        self.assertEqual((stats["created"], stats["discarded"]), (2, 1))
+        self.assertEqual(stats["open"], 1)
+
+    def test_child_process_does_not_reuse_parent_connections(self):
+        wrapper = self.connect()
+        wrapper.close()
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            try:
+                self.connect()
+                stats = self.get_pool().get_stats()
+                output = f"{stats['created']} {stats['reused']}"
+                os.write(write, output.encode())
+            finally:
+                os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as output:
+            self.assertEqual(output.read(), "1 0")
+        os.waitpid(pid, 0)
+        wrapper.ensure_connection()
+        self.assertEqual(self.get_pool().get_stats()["reused"], 1)
+
+    def test_connection_closed_in_atomic_block_is_discarded(self):
+        wrapper = self.connect()
+        with mock.patch.object(
+            transaction, "get_connection", return_value=wrapper
+        ):
+            with transaction.atomic(using=ALIAS):
+                wrapper.close()
+        stats = self.get_pool().get_stats()
+        self.assertEqual((stats["discarded"], stats["open"]), (1, 0))
+        self.assertEqual(stats["idle"], 0)
+
+    def test_counters_are_exported(self):
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(
+                name, {"database": ALIAS, **labels}
+            ) or 0
+
+        created = sample("foodgram_db_pool_checkouts_total", result="created")
+        timeouts = sample("foodgram_db_pool_timeouts_total")
+        self.connect()
+        self.connect()
+        with self.assertRaises(OperationalError):
+            self.connect()
+        self.assertEqual(
+            sample("foodgram_db_pool_checkouts_total", result="created"),
+            created + 2,
+        )
+        self.assertEqual(
+            sample("foodgram_db_pool_timeouts_total"), timeouts + 1
+        )
+        self.assertEqual(
+            sample("foodgram_db_pool_connections", state="in_use"), 2
+        )
+
+
+class CounterFieldsTest(TestCase):
+    """Saves of a stale instance keep counters changed meanwhile."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=name,
+                email=f"{name}@example.com",
+                password="password",
+                first_name=name,
+                last_name=name,
+            )
+            for name in ("author", "reader")
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name="Soup", text="Text", cooking_time=5
+        )
+
+    def test_user_save_keeps_counters(self):
+        author = User.objects.get(pk=self.author.pk)
+        Follow.objects.create(user=self.reader, author=self.author)
+        author.first_name = "Renamed"
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.recipes_count, 1)
+        self.assertEqual(author.first_name, "Renamed")
+
+    def test_recipe_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorites.objects.create(user=self.reader, recipe=self.recipe)
+        recipe.name = "Broth"
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.name, "Broth")
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 import environ
@@ -31,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.RequestProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,7 +43,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -71,12 +74,21 @@ if DEBUG:
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': 'foodgram.db.postgresql',
             'NAME': os.getenv('POSTGRES_DB', 'django'),
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 0)),
+            'POOL': {
+                'SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+                'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                'IDLE_TIMEOUT': float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+                'HEALTH_CHECK_AFTER': float(
+                    os.getenv('DB_POOL_HEALTH_CHECK_AFTER', 0)
+                ),
+            },
         }
     }
 
@@ -115,13 +127,33 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+        ),
+    },
+    'recipes': {
+        'BACKEND': os.getenv(
+            'RECIPE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RECIPE_CACHE_LOCATION', 'recipes'),
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -148,7 +180,66 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 240),
+    'card': (640, 480),
+    'full': None,
+}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+
+BULK_MAX_ITEMS = 100
+
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 100
+FEED_BATCH_SIZE = 1000
+
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 10
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS')
+
+RECIPE_FRAGMENT_CACHE = 'recipes'
+RECIPE_FRAGMENT_TTL = 60 * 60
+
+COLD_START_BUDGET = float(os.getenv('COLD_START_BUDGET', 5))
+
+SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', 1))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+INGREDIENT_INDEX_TTL = 300
+CATALOGUE_CACHE_TTL = int(os.getenv('CATALOGUE_CACHE_TTL', 300))
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 SLICE_OF_TEXT = 15
 SLICE_OF_TEXT_LONG = 75
 
 AUTH_USER_MODEL = 'users.User'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+        'foodgram': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
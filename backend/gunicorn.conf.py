@@ -0,0 +1,33 @@
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 3))
+preload_app = True
+
+# Samples of the previous run would be added to the new ones.
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+
+def when_ready(server):
+    from api.warmup import warm_up
+    from django.db import connections
+    from foodgram.db.pool import close_pools
+
+    warm_up()
+    # Sockets opened by the master must not be shared by the workers.
+    connections.close_all()
+    close_pools()
+
+
+def post_fork(server, worker):
+    from api.warmup import connect_databases
+
+    connect_databases()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -16,9 +16,7 @@ class RecipeAdmin(admin.ModelAdmin):
         'text', 'author', 'favorites_count'
     )
     list_filter = ('name', 'author', 'tags')
-
-    def favorites_count(self, object):
-        return object.is_favorited.count()
+    readonly_fields = ('favorites_count',)
 
 
 @admin.register(Ingredient)
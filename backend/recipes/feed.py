@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from users.models import Follow
+
+from .models import FeedEntry, Recipe
+
+
+def is_fanned_out(author):
+    return author.followers_count <= settings.FEED_FANOUT_LIMIT
+
+
+def fan_out_recipe(recipe):
+    """Push a new recipe into the timelines of its author's followers.
+
+    Authors with more than ``FEED_FANOUT_LIMIT`` followers are skipped;
+    their recipes are pulled at read time by ``get_feed``.
+    """
+    if not is_fanned_out(recipe.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list("user_id", flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe=recipe) for user_id in followers),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_follow(follow):
+    """Copy the latest recipes of a newly followed author to the feed."""
+    if not is_fanned_out(follow.author):
+        return
+    recipes = Recipe.objects.filter(
+        author_id=follow.author_id
+    ).values_list("id", flat=True)[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=follow.user_id, recipe_id=id) for id in recipes),
+        ignore_conflicts=True,
+    )
+
+
+def remove_follows(user, author_ids):
+    FeedEntry.objects.filter(
+        user=user, recipe__author_id__in=author_ids
+    ).delete()
+
+
+def remove_follow(follow):
+    remove_follows(follow.user_id, [follow.author_id])
+
+
+def get_feed(queryset, user):
+    """Recipes from the timeline of ``user`` plus pulled popular authors."""
+    pulled_authors = Follow.objects.filter(
+        user=user, author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values("author")
+    if not pulled_authors.exists():
+        return queryset.filter(feed_entries__user=user)
+    return queryset.filter(
+        Exists(FeedEntry.objects.filter(user=user, recipe=OuterRef("pk")))
+        | Q(author__in=pulled_authors)
+    )
@@ -0,0 +1,88 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+VARIANTS_DIR = "variants"
+
+logger = logging.getLogger(__name__)
+
+executor = None
+
+
+def render_variants(source, variants, quality):
+    """Write a WebP file for every variant next to the source image.
+
+    Runs in a pool process, so it only touches the filesystem; the
+    returned mapping of variant names to paths is stored by the caller.
+    """
+    directory = os.path.join(os.path.dirname(source), VARIANTS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    rendered = {}
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        for name, size in variants.items():
+            variant = image
+            if size is not None:
+                variant = ImageOps.fit(image, size, Image.LANCZOS)
+            path = os.path.join(directory, f"{stem}_{name}.webp")
+            variant.save(path, "WEBP", quality=quality)
+            rendered[name] = path
+    return rendered
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS
+        )
+    return executor
+
+
+def submit(image_name):
+    return get_executor().submit(
+        render_variants,
+        default_storage.path(image_name),
+        settings.IMAGE_VARIANTS,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+def store_variants(recipe_id, image_name, rendered):
+    """Save variant names, unless the recipe image changed meanwhile."""
+    variants = {"source": image_name}
+    for name, path in rendered.items():
+        variants[name] = os.path.relpath(path, settings.MEDIA_ROOT)
+    Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_variants=variants, updated=timezone.now()
+    )
+
+
+def schedule_variants(recipe_id, image_name):
+    """Render variants on the process pool after the transaction commits."""
+
+    def store(future):
+        close_old_connections()
+        try:
+            store_variants(recipe_id, image_name, future.result())
+        except Exception:
+            logger.exception("Could not render variants of %s", image_name)
+        finally:
+            close_old_connections()
+
+    transaction.on_commit(
+        lambda: submit(image_name).add_done_callback(store)
+    )
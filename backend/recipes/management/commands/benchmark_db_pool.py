@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from foodgram.db.pool import (PooledDatabaseWrapperMixin, close_pools,
+                              get_pool, pools)
+from recipes.models import Tag
+
+from .benchmark_read_path import summarize
+
+
+def run(requests, concurrency):
+    """Requests that make one cheap query, as the tag list would."""
+
+    def client(count):
+        results = []
+        for _ in range(count):
+            started = perf_counter()
+            request_started.send(sender=None)
+            try:
+                Tag.objects.exists()
+            finally:
+                request_finished.send(sender=None)
+            results.append((perf_counter() - started, 200))
+        return results
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = executor.map(
+            client, [requests // concurrency] * concurrency
+        )
+        results = [item for result in results for item in result]
+    return summarize(results, perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests that open a new database connection with "
+        "requests that take one from the connection pool, and print the "
+        "pool counters used to size it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Number of requests per mode.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Number of threads sending requests at the same time.",
+        )
+        parser.add_argument(
+            "--size",
+            type=int,
+            help="Pool size to use instead of the configured one.",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Alias of the database to connect to.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if not isinstance(connection, PooledDatabaseWrapperMixin):
+            raise CommandError(
+                "The database engine does not pool connections; use "
+                "foodgram.db.postgresql or foodgram.db.sqlite3."
+            )
+        requests = options["requests"]
+        concurrency = options["concurrency"]
+        if requests < concurrency or concurrency < 1:
+            raise CommandError(
+                "Requests must be at least the concurrency, which must be "
+                "positive."
+            )
+        settings_dict = connection.settings_dict
+        configured = settings_dict.get("POOL")
+        pool_options = dict(configured or {})
+        if options["size"]:
+            pool_options["SIZE"] = options["size"]
+        connection.close()
+
+        self.stdout.write(
+            f"{'mode':<7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        try:
+            for mode, pool in (("direct", None), ("pooled", pool_options)):
+                settings_dict["POOL"] = pool
+                pools.clear()
+                rps, p50, p99, _ = run(requests, concurrency)
+                self.stdout.write(
+                    f"{mode:<7} {rps:>8.1f} "
+                    f"{p50 * 1000:>8.2f} {p99 * 1000:>8.2f}"
+                )
+            stats = get_pool(connection.alias, settings_dict).get_stats()
+        finally:
+            settings_dict["POOL"] = configured
+            close_pools()
+            pools.clear()
+        self.stdout.write("")
+        for key, value in stats.items():
+            if isinstance(value, float):
+                value = f"{value * 1000:.2f} ms"
+            self.stdout.write(f"{key:<14} {value}")
@@ -0,0 +1,194 @@
+import asyncio
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from time import perf_counter
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from recipes.models import Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+ASYNC_URLCONF = "foodgram.async_urls"
+
+
+def get_paths(authenticated):
+    paths = ["/api/tags/", "/api/ingredients/", "/api/recipes/"]
+    ingredient = Ingredient.objects.values_list("name", flat=True).first()
+    if ingredient:
+        paths.append(f"/api/ingredients/?name={ingredient[:2]}")
+    recipe = Recipe.objects.values_list("id", flat=True).first()
+    if recipe:
+        paths.append(f"/api/recipes/{recipe}/")
+    if authenticated:
+        paths.append("/api/recipes/download_shopping_cart/")
+    return paths
+
+
+def summarize(results, elapsed):
+    latencies = [latency for latency, _ in results]
+    return (
+        len(latencies) / elapsed,
+        statistics.median(latencies),
+        statistics.quantiles(latencies, n=100)[98],
+        sum(not 200 <= status < 400 for _, status in results),
+    )
+
+
+def run_wsgi(path, headers, host, requests, concurrency, workers):
+    """Clients share ``workers`` sync workers, as with gunicorn."""
+    handler = WSGIHandler()
+    environ = RequestFactory().get(
+        path, HTTP_HOST=host, **{
+            "HTTP_" + name.upper().replace("-", "_"): value
+            for name, value in headers
+        }
+    ).environ
+    worker_slots = BoundedSemaphore(workers)
+
+    def client(count):
+        results = []
+        for _ in range(count):
+            started = perf_counter()
+            with worker_slots:
+                response = handler(dict(environ), lambda *args: None)
+                for _ in response:
+                    pass
+                response.close()
+                status = response.status_code
+            results.append((perf_counter() - started, status))
+        return results
+
+    started = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = executor.map(
+            client, [requests // concurrency] * concurrency
+        )
+        results = [item for result in results for item in result]
+    return summarize(results, perf_counter() - started)
+
+
+def run_asgi(path, headers, host, requests, concurrency):
+    """Clients share one event loop, as with a single uvicorn worker."""
+    handler = ASGIHandler()
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(b"host", host.encode())] + [
+            (name.encode(), value.encode()) for name, value in headers
+        ],
+        "server": (host, 80),
+        "client": ("127.0.0.1", 0),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def client(count):
+        results = []
+        for _ in range(count):
+            response = {}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+
+            started = perf_counter()
+            await handler(dict(scope), receive, send)
+            results.append((perf_counter() - started, response["status"]))
+        return results
+
+    async def main():
+        results = await asyncio.gather(
+            *[client(requests // concurrency) for _ in range(concurrency)]
+        )
+        return [item for result in results for item in result]
+
+    started = perf_counter()
+    results = asyncio.run(main())
+    return summarize(results, perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second and latency of the read endpoints "
+        "served by sync WSGI workers and by the async ASGI views. "
+        "Requests are made in-process, so the numbers exclude the network "
+        "and compare only the two request handling models."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of requests per endpoint and mode.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Number of clients sending requests at the same time.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=3,
+            help="Number of sync workers in the WSGI mode.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Email of the user to authenticate the requests as.",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="Host header; must be listed in ALLOWED_HOSTS.",
+        )
+
+    def handle(self, *args, **options):
+        headers = []
+        if options["user"]:
+            try:
+                user = User.objects.get(email=options["user"])
+            except User.DoesNotExist:
+                raise CommandError("User not found.")
+            token, _ = Token.objects.get_or_create(user=user)
+            headers.append(("authorization", f"Token {token.key}"))
+        requests = options["requests"]
+        concurrency = options["concurrency"]
+        if requests < concurrency or concurrency < 1:
+            raise CommandError(
+                "Requests must be at least the concurrency, which must be "
+                "positive."
+            )
+
+        self.stdout.write(
+            f"{'mode':<5} {'endpoint':<45} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p99 ms':>8} {'errors':>6}"
+        )
+        for path in get_paths(bool(headers)):
+            results = {
+                "wsgi": run_wsgi(
+                    path, headers, options["host"], requests,
+                    concurrency, options["workers"],
+                ),
+            }
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                results["asgi"] = run_asgi(
+                    path, headers, options["host"], requests, concurrency
+                )
+            for mode, (rps, p50, p99, errors) in results.items():
+                self.stdout.write(
+                    f"{mode:<5} {path:<45} {rps:>8.1f} "
+                    f"{p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>6}"
+                )
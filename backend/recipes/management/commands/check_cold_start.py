@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+STARTUP_SCRIPT = """
+from time import perf_counter
+started = perf_counter()
+from foodgram.wsgi import application
+loaded = perf_counter()
+from api.warmup import warm_up
+warm_up()
+print(loaded - started, perf_counter() - loaded)
+"""
+
+
+def parse_import_times(output):
+    """Import time in seconds of every package, subpackages included.
+
+    ``output`` is what ``python -X importtime`` writes to stderr. Own
+    times of the modules are summed per top-level package, so nested
+    imports are not counted twice.
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        times[package] = times.get(package, 0) + int(own) / 1_000_000
+    return times
+
+
+def measure_cold_start():
+    """Start the application in a fresh interpreter and time it.
+
+    Returns the time to load the application, the time to warm it up
+    and the import times of the packages.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    if result.returncode:
+        raise CommandError(
+            f"The application failed to start:\n{result.stderr[-2000:]}"
+        )
+    load, warm_up = map(float, result.stdout.split()[-2:])
+    return load, warm_up, parse_import_times(result.stderr)
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the application in a fresh interpreter, report the import "
+        "time of the slowest packages and fail when the cold start takes "
+        "longer than COLD_START_BUDGET seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=settings.COLD_START_BUDGET,
+            help="Cold start budget in seconds.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Number of the slowest packages to list.",
+        )
+
+    def handle(self, *args, **options):
+        load, warm_up, import_times = measure_cold_start()
+        slowest = sorted(
+            import_times.items(), key=lambda item: item[1], reverse=True
+        )
+        self.stdout.write(f"{'package':<50} {'import ms':>10}")
+        for name, seconds in slowest[:options["top"]]:
+            self.stdout.write(f"{name:<50} {seconds * 1000:>10.1f}")
+        total = load + warm_up
+        self.stdout.write(
+            f"\nImports {sum(import_times.values()):.3f} s, "
+            f"application load {load:.3f} s, warm-up {warm_up:.3f} s, "
+            f"cold start {total:.3f} s."
+        )
+        if total > options["budget"]:
+            raise CommandError(
+                f"Cold start took {total:.3f} s, over the budget of "
+                f"{options['budget']:.3f} s."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Cold start is within the budget of {options['budget']:.3f} s."
+        ))
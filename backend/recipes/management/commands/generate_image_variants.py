@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand
+from recipes.images import get_executor, store_variants, submit
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Render thumbnail and WebP variants for existing recipe images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Render variants again even if they are up to date.",
+        )
+
+    def handle(self, *args, **options):
+        recipes = [
+            (recipe.id, recipe.image.name)
+            for recipe in Recipe.objects.exclude(image="").only(
+                "id", "image", "image_variants"
+            ).iterator()
+            if options["all"]
+            or recipe.image_variants.get("source") != recipe.image.name
+        ]
+        get_executor()
+        futures = [
+            (id, image_name, submit(image_name))
+            for id, image_name in recipes
+        ]
+        failed = 0
+        for id, image_name, future in futures:
+            try:
+                store_variants(id, image_name, future.result())
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"{image_name}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Variants have been rendered for {len(recipes) - failed} "
+            f"of {len(recipes)} recipes"
+        ))
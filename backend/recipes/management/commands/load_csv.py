@@ -1,27 +1,154 @@
 import csv
+import io
+import json
+import os
+from itertools import islice
+from time import perf_counter
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
+from recipes.signals import ingredients_loaded
 
-TABLES = {
-    Ingredient: "ingredients.csv",
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f"Line {reader.line_num}: expected a name and a measurement "
+                "unit."
+            )
+        yield row[0], row[1]
+
+
+def read_json(file):
+    """Yield items of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = (buffer + chunk).lstrip()
+        if not started and buffer:
+            if buffer[0] != "[":
+                raise CommandError("JSON file must contain an array.")
+            buffer = buffer[1:].lstrip()
+            started = True
+        while started and buffer:
+            if buffer[0] == "]":
+                return
+            if buffer[0] == ",":
+                buffer = buffer[1:].lstrip()
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            buffer = buffer[end:].lstrip()
+            yield item["name"], item["measurement_unit"]
+        if not chunk:
+            raise CommandError("JSON file is truncated.")
+
+
+READERS = {
+    ".csv": read_csv,
+    ".json": read_json,
 }
 
 
+def batches(rows, batch_size):
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_batch(cursor, batch):
+    """Load a batch through ``COPY`` and skip rows that already exist."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY ingredient_load (name, measurement_unit) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    cursor.execute(
+        f"INSERT INTO {Ingredient._meta.db_table} (name, measurement_unit) "
+        "SELECT DISTINCT name, measurement_unit FROM ingredient_load "
+        "ON CONFLICT (name, measurement_unit) DO NOTHING"
+    )
+    cursor.execute("TRUNCATE ingredient_load")
+
+
+def create_batch(batch):
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in batch
+        ),
+        ignore_conflicts=True,
+    )
+
+
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        for model, csv_f in TABLES.items():
-            with open(
-                f"{settings.BASE_DIR}/data/{csv_f}", "r", encoding="utf-8"
-            ) as csv_file:
-                reader = csv.reader(csv_file)
-                for row in reader:
-                    name = row[0]
-                    measurement_unit = row[1]
-                    model.objects.create(
-                        name=name, measurement_unit=measurement_unit
+    help = "Load ingredients from a CSV or JSON file, skipping existing ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=os.path.join(settings.BASE_DIR, "data", "ingredients.csv"),
+            help="CSV (name,unit rows) or JSON (array of objects) file.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of rows inserted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(
+                f"Unsupported file type. Choose one of: {', '.join(READERS)}."
+            )
+        use_copy = connection.vendor == "postgresql"
+        initial_count = Ingredient.objects.count()
+        processed = 0
+        started = perf_counter()
+
+        with open(path, "r", encoding="utf-8") as file, transaction.atomic():
+            with connection.cursor() as cursor:
+                if use_copy:
+                    cursor.execute(
+                        "CREATE TEMP TABLE ingredient_load "
+                        "(name varchar(200), measurement_unit varchar(200)) "
+                        "ON COMMIT DROP"
                     )
+                for batch in batches(reader(file), options["batch_size"]):
+                    if use_copy:
+                        copy_batch(cursor, batch)
+                    else:
+                        create_batch(batch)
+                    processed += len(batch)
+
+        elapsed = perf_counter() - started
+        created = Ingredient.objects.count() - initial_count
+        ingredients_loaded.send(sender=Ingredient)
+        self.stdout.write(
+            f"{processed} rows processed, {created} ingredients created "
+            f"in {elapsed:.2f}s ({processed / max(elapsed, 1e-6):.0f} rows/s)"
+        )
         self.stdout.write(self.style.SUCCESS(
-            "Data from the CSV file has been successfully loaded"
+            "Data from the file has been successfully loaded"
         ))
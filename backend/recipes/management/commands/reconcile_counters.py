@@ -0,0 +1,52 @@
+from django.core.management import BaseCommand
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from recipes.models import Favorites, Recipe
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorites, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Follow, "author"),
+)
+
+
+class Command(BaseCommand):
+    help = "Recalculate denormalized counters that drifted from the rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of primary keys checked per query.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, field, related_model, related_field in COUNTERS:
+            actual = Coalesce(Subquery(
+                related_model.objects.filter(
+                    **{related_field: OuterRef("pk")}
+                ).order_by().values(related_field).annotate(
+                    total=Count("pk")
+                ).values("total")
+            ), 0)
+            # Clients revalidate recipes by the time they were updated.
+            touch = {"updated": timezone.now()} if model is Recipe else {}
+            last_pk = model.objects.aggregate(last=Max("pk"))["last"] or 0
+            repaired = 0
+            for start in range(0, last_pk + 1, batch_size):
+                drifted = model.objects.filter(
+                    pk__gte=start, pk__lt=start + batch_size
+                ).annotate(actual=actual).exclude(**{field: F("actual")})
+                repaired += model.objects.filter(
+                    pk__in=drifted.values("pk")
+                ).update(**{field: actual}, **touch)
+            self.stdout.write(
+                f"{model.__name__}.{field}: {repaired} rows repaired"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Counters have been successfully reconciled"
+        ))
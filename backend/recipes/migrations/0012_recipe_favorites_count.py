@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_favorites_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorites = apps.get_model('recipes', 'Favorites')
+    favorites = Favorites.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.update(favorites_count=Coalesce(Subquery(favorites), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_alter_ingredient_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of users who added the recipe to favorites', verbose_name='Added to favorites'),
+        ),
+        migrations.RunPython(fill_favorites_count, migrations.RunPython.noop),
+    ]
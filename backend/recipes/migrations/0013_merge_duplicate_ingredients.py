@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(kept=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['kept'])
+        recipes = set(IngredientInRecipe.objects.filter(
+            ingredient_id=duplicate['kept']
+        ).values_list('recipe_id', flat=True))
+        for used in IngredientInRecipe.objects.filter(ingredient__in=extra):
+            if used.recipe_id in recipes:
+                used.delete()
+                continue
+            used.ingredient_id = duplicate['kept']
+            used.save(update_fields=['ingredient'])
+            recipes.add(used.recipe_id)
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
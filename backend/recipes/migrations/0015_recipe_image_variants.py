@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_ingredient_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Paths of the resized WebP copies of the image', verbose_name='Image variants'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_gin '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe SET search_vector = '
+            "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A')"
+            " || setweight(to_tsvector(%s::regconfig, coalesce(text, '')), "
+            "'B')",
+            params=[settings.SEARCH_CONFIG, settings.SEARCH_CONFIG],
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, text)'
+        )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+            'SELECT id, name, text FROM recipes_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Weighted full-text vector of the name and description', null=True, verbose_name='Search vector'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
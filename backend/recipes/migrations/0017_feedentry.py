@@ -0,0 +1,51 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    follows = Follow.objects.filter(
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        recipes = Recipe.objects.filter(author_id=author_id).order_by(
+            '-id'
+        ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE]
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, recipe_id=id) for id in recipes),
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0009_user_recipes_count_followers_count'),
+        ('recipes', '0016_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(help_text='Recipe info', on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Recipe name')),
+                ('user', models.ForeignKey(help_text='User info', on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Feed entry',
+                'verbose_name_plural': 'Feed entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
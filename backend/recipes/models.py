@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from foodgram.db.counters import CounterFieldsMixin
 from foodgram.settings import SLICE_OF_TEXT, SLICE_OF_TEXT_LONG
 
 from .validators import validate_slug
@@ -44,7 +46,9 @@ class Tag(models.Model):
         return self.name[:SLICE_OF_TEXT]
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
+    counter_fields = ("favorites_count",)
+
     ingredients = models.ManyToManyField(
         "Ingredient",
         through="IngredientInRecipe",
@@ -84,6 +88,35 @@ class Recipe(models.Model):
         verbose_name="Author",
         help_text="Author info",
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Image variants",
+        help_text="Paths of the resized WebP copies of the image",
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Added to favorites",
+        help_text="Number of users who added the recipe to favorites",
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Search vector",
+        help_text="Weighted full-text vector of the name and description",
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Created",
+        help_text="Time the recipe was published",
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Updated",
+        help_text="Time the recipe representation last changed",
+    )
 
     class Meta:
         verbose_name = "Recipe"
@@ -109,6 +142,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ingredient"
         verbose_name_plural = "Ingredients"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.measurement_unit})"[:SLICE_OF_TEXT_LONG]
@@ -214,3 +253,35 @@ class Favorites(models.Model):
             f"User '{self.user}' likes "
             f"{self.recipe}"[:SLICE_OF_TEXT_LONG]
         )
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="User",
+        help_text="User info",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Recipe name",
+        help_text="Recipe info",
+    )
+
+    class Meta:
+        verbose_name = "Feed entry"
+        verbose_name_plural = "Feed entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_feed_entry"
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"'{self.recipe}' in the feed of "
+            f"'{self.user}'"[:SLICE_OF_TEXT_LONG]
+        )
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, SearchVector)
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Recipe
+
+FTS_TABLE = "recipes_recipe_fts"
+# The database marks the matches with characters of the private use
+# area, which are replaced with tags once the text is escaped.
+SNIPPET_START = "\ue000"
+SNIPPET_STOP = "\ue001"
+
+
+def highlight(snippet):
+    """Escaped snippet with the matches in ``<b>`` tags."""
+    return escape(snippet).replace(SNIPPET_START, "<b>").replace(
+        SNIPPET_STOP, "</b>"
+    )
+
+
+def is_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def search_vector():
+    return (
+        SearchVector("name", weight="A", config=settings.SEARCH_CONFIG)
+        + SearchVector("text", weight="B", config=settings.SEARCH_CONFIG)
+    )
+
+
+def update_search_index(recipe):
+    if is_postgresql():
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_vector=search_vector()
+        )
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe.pk]
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, text) VALUES (%s, %s, %s)",
+            [recipe.pk, recipe.name, recipe.text],
+        )
+
+
+def remove_from_search_index(recipe):
+    if not is_postgresql():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe.pk]
+            )
+
+
+def fts_query(value):
+    """Quote every word so user input cannot use FTS5 query syntax."""
+    words = value.replace('"', " ").split()
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_query(value):
+    return SearchQuery(
+        value, config=settings.SEARCH_CONFIG, search_type="websearch"
+    )
+
+
+def search_recipes(queryset, value):
+    """Filter recipes by full-text match, best ranked first.
+
+    Nothing is annotated, so counts and aggregates over the result do not
+    rank the matches; the snippets are made by ``get_snippets`` for the
+    recipes of a page only.
+    """
+    if is_postgresql():
+        query = search_query(value)
+        return queryset.filter(search_vector=query).order_by(
+            SearchRank(F("search_vector"), query).desc(), "-id"
+        )
+
+    match = fts_query(value)
+    if not match:
+        return queryset.none()
+    table = Recipe._meta.db_table
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        (match,),
+    )).order_by(
+        RawSQL(
+            f"SELECT bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE}.rowid = {table}.id "
+            f"AND {FTS_TABLE} MATCH %s",
+            (match,),
+        ).asc(),
+        "-id",
+    )
+
+
+def get_snippets(ids, value):
+    """Snippets of the text of recipes ``ids`` matching ``value``, by id."""
+    if is_postgresql():
+        snippets = Recipe.objects.filter(pk__in=ids).annotate(
+            snippet=SearchHeadline(
+                "text",
+                search_query(value),
+                config=settings.SEARCH_CONFIG,
+                start_sel=SNIPPET_START,
+                stop_sel=SNIPPET_STOP,
+            ),
+        ).values_list("id", "snippet")
+    else:
+        match = fts_query(value)
+        if not match or not ids:
+            return {}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 1, %s, %s, '…', 16) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"AND rowid IN ({', '.join(['%s'] * len(ids))})",
+                [SNIPPET_START, SNIPPET_STOP, match, *ids],
+            )
+            snippets = cursor.fetchall()
+    return {pk: highlight(snippet) for pk, snippet in snippets}
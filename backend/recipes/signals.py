@@ -0,0 +1,134 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from users.models import Follow
+
+from .feed import (backfill_follow, fan_out_recipe, remove_follow,
+                   remove_follows)
+from .images import schedule_variants
+from .models import Favorites, Ingredient, Recipe, Tag, User
+from .search import remove_from_search_index, update_search_index
+
+ingredients_loaded = Signal()
+relations_added = Signal()
+relations_removed = Signal()
+
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+def touch_recipes(**lookup):
+    """Mark recipes whose representation includes a changed object."""
+    Recipe.objects.filter(**lookup).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Favorites)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1,
+            updated=timezone.now(),
+        )
+
+
+@receiver(post_delete, sender=Favorites)
+def favorite_deleted(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, favorites_count__gt=0
+    ).update(
+        favorites_count=F("favorites_count") - 1, updated=timezone.now()
+    )
+
+
+@receiver(relations_added, sender=Favorites)
+def favorites_added(sender, target_ids, **kwargs):
+    Recipe.objects.filter(pk__in=target_ids).update(
+        favorites_count=F("favorites_count") + 1, updated=timezone.now()
+    )
+
+
+@receiver(relations_removed, sender=Favorites)
+def favorites_removed(sender, target_ids, **kwargs):
+    Recipe.objects.filter(pk__in=target_ids, favorites_count__gt=0).update(
+        favorites_count=F("favorites_count") - 1, updated=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and "image" not in update_fields:
+        return
+    image_name = instance.image.name
+    if image_name and instance.image_variants.get("source") != image_name:
+        schedule_variants(instance.id, image_name)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F("recipes_count") - 1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or {"name", "text"} & update_fields:
+        update_search_index(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed_from_search(sender, instance, **kwargs):
+    remove_from_search_index(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        backfill_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    remove_follow(instance)
+
+
+@receiver(relations_added, sender=Follow)
+def follows_added(sender, user, target_ids, **kwargs):
+    for follow in Follow.objects.filter(
+        user=user, author_id__in=target_ids
+    ).select_related("author"):
+        backfill_follow(follow)
+
+
+@receiver(relations_removed, sender=Follow)
+def follows_removed(sender, user, target_ids, **kwargs):
+    remove_follows(user, target_ids)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS & update_fields:
+        touch_recipes(author=instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    touch_recipes(ingredients=instance)
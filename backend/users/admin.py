@@ -5,7 +5,11 @@ from .models import Follow, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'username', 'email', 'recipes_count', 'followers_count'
+    )
     list_filter = ('username', 'email',)
+    readonly_fields = ('recipes_count', 'followers_count')
 
 
 @admin.register(Follow)
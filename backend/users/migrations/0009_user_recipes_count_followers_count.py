@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.filter(
+        author=OuterRef('pk')
+    ).order_by().values('author').annotate(total=Count('pk')).values('total')
+    followers = Follow.objects.filter(
+        author=OuterRef('pk')
+    ).order_by().values('author').annotate(total=Count('pk')).values('total')
+    User.objects.update(
+        recipes_count=Coalesce(Subquery(recipes), 0),
+        followers_count=Coalesce(Subquery(followers), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_favorites_count'),
+        ('users', '0008_remove_user_is_subscribed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of users subscribed to the user', verbose_name='Followers'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of recipes published by the user', verbose_name='Recipes'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from foodgram.db.counters import CounterFieldsMixin
 from foodgram.settings import SLICE_OF_TEXT, SLICE_OF_TEXT_LONG
 
 from .validators import validate_username
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
+    counter_fields = ("recipes_count", "followers_count")
+
     email = models.EmailField(
         max_length=254,
         unique=True,
@@ -37,6 +40,18 @@ class User(AbstractUser):
         verbose_name="Last name",
         help_text="Last name info",
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Recipes",
+        help_text="Number of recipes published by the user",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Followers",
+        help_text="Number of users subscribed to the user",
+    )
 
     class Meta:
         verbose_name = "User"
@@ -0,0 +1,35 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.signals import relations_added, relations_removed
+
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F("followers_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, followers_count__gt=0
+    ).update(followers_count=F("followers_count") - 1)
+
+
+@receiver(relations_added, sender=Follow)
+def follows_added(sender, target_ids, **kwargs):
+    User.objects.filter(pk__in=target_ids).update(
+        followers_count=F("followers_count") + 1
+    )
+
+
+@receiver(relations_removed, sender=Follow)
+def follows_removed(sender, target_ids, **kwargs):
+    User.objects.filter(pk__in=target_ids, followers_count__gt=0).update(
+        followers_count=F("followers_count") - 1
+    )